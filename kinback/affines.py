@@ -57,19 +57,20 @@ class tf:
     def isconformal(self):
         a, b, c, d = self.v[:4]
         return isclose(a, d) and isclose(b, -c) or isclose(a, -d) and isclose(b, c) # TODO legacy function, used in spallator
-    def tosvg(self):
-        """Shortest representation of this matrix in SVG. An empty string returned represents the identity matrix."""
+    def tosvg(self, D = 8):
+        """Shortest representation of this matrix in SVG. An empty string returned represents the identity matrix.
+        D is passed on to fsmn for the translations and rotation centres; scales and angles keep full precision."""
         a, b, c, d, e, f = self.v
         if   isclose(a, d) and isclose(b, -c): reflected = False
         elif isclose(a, -d) and isclose(b, c): reflected = True
-        else: return "matrix({})".format(catn(*(fsmn(x) for x in self.v))) # matrix not conformal, default output
+        else: return "matrix({})".format(catn(*([fsmn(x) for x in self.v[:4]] + [fsmn(e, D), fsmn(f, D)]))) # matrix not conformal, default output
         z = complex(a, b)
         r, th = polar(z)
         mr, mth = fsmn(r), fsmn(degrees(th) % 360)
         if reflected: sc_cmd = "scale({0}-{0})".format(mr)
         else: sc_cmd = "scale({})".format(mr) * (mr != "1")
         if isclose(th, 0) or mth == "360": # translation; second condition prevents large rotation centre coordinates
-            dx, dy = fsmn(e), fsmn(f)
+            dx, dy = fsmn(e, D), fsmn(f, D)
             if dy == "0": tr_cmd = "translate({})".format(dx) * (dx != "0")
             else: tr_cmd = "translate({})".format(catn(dx, dy))
             return tr_cmd + sc_cmd
@@ -77,7 +78,7 @@ class tf:
         else:
             z /= r # z.real = cos(th), z.imag = sin(th)
             k, l = 1 - z.real, z.imag
-            mx, my = fsmn((e * k - f * l) / (2 * k)), fsmn((e * l + f * k) / (2 * k))
+            mx, my = fsmn((e * k - f * l) / (2 * k), D), fsmn((e * l + f * k) / (2 * k), D)
             ro_cmd = "rotate({})".format(catn(mth, mx, my))
         return ro_cmd + sc_cmd
     def minstr(s): return tf.fromsvg(s).tosvg() # convenience function to compress an SVG transformation string
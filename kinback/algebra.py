@@ -8,6 +8,7 @@ from itertools import zip_longest
 def linterp(p, q, t): return (1 - t) * p + t * q
 
 def cross(a, b, o = 0j): return (a.real - o.real) * (b.imag - o.imag) - (a.imag - o.imag) * (b.real - o.real)
+def dot(a, b, o = 0j): return (a.real - o.real) * (b.real - o.real) + (a.imag - o.imag) * (b.imag - o.imag)
 def collinear(a, b, c): return isclose(cross(a, b, c), 0)
 
 def pointbounds(pts): # orthogonal bounding box of an array of points, represented as a tuple of opposing corners
@@ -68,7 +69,7 @@ def polroots(p_in):
         return res
     while len(p) > 4: # use Laguerre's method
         n, x, delta = len(p) - 1, 0, 1
-        p1 = p_in.d()
+        p1 = p.d()
         p2 = p1.d()
         for q in range(64):
             at = p(x)
@@ -2,6 +2,8 @@
 # Parcly Taxel / Jeremy Tan, 2016
 # https://parclytaxel.tumblr.com
 from math import isclose
+try: import numpy as np
+except ImportError: np = None
 
 # An RGBA/LABI/LCHI colour is a 4-tuple of floats. CSS aliases follow in the order Wikipedia gives them:
 aliases = {"pink": (255, 192, 203), # Pink
@@ -225,8 +227,8 @@ def rgb2xyz(c):
     return (z[0], z[1], z[2], c[3])
 def xyz2lab(c):
     z = [116 * lumroot(c[1] / yn) - 16,
-         500 * (lumroot(c[0] / xn) - cise(c[1] / yn)),
-         200 * (lumroot(c[1] / yn) - cise(c[2] / zn))]
+         500 * (lumroot(c[0] / xn) - lumroot(c[1] / yn)),
+         200 * (lumroot(c[1] / yn) - lumroot(c[2] / zn))]
     return (z[0], z[1], z[2], c[3])
 def lab2xyz(c):
     l0 = (c[0] + 16) / 116
@@ -237,6 +239,27 @@ def lab2xyz(c):
 def rgb2lab(c): return xyz2lab(rgb2xyz(c))
 def lab2rgb(c): return xyz2rgb(lab2xyz(c))
 
+# Greedy clustering of colours in CIELAB: taking the colours in order of decreasing weight, each joins the nearest earlier leader within de
+# (CIE76 ΔE) of it or becomes a leader itself, so that no colour moves further than de. Leaders are found through a grid of cells of side de
+# keyed by the quantised alpha as well, so only the 27 cells around a colour need searching and colours of different opacities never merge.
+def colourclusters(cols, de, weights = None):
+    """Returns the index of the leader (representative) of each of the RGBA tuples cols."""
+    order = sorted(range(len(cols)), key=lambda i: -weights[i]) if weights else range(len(cols))
+    grid, res = {}, [None] * len(cols)
+    for i in order:
+        lab = rgb2lab(cols[i])[:3]
+        key = (round(cols[i][3] * 255),) + tuple(int(x // de) for x in lab)
+        best, bd = i, de * de
+        for dl in (-1, 0, 1):
+            for da in (-1, 0, 1):
+                for db in (-1, 0, 1):
+                    for j, jl in grid.get((key[0], key[1] + dl, key[2] + da, key[3] + db), ()):
+                        d = sum((p - q) ** 2 for p, q in zip(lab, jl))
+                        if d <= bd: best, bd = j, d
+        res[i] = best
+        if best == i: grid.setdefault(key, []).append((i, lab))
+    return res
+
 # Calculations may occasionally produce values outside [0, 1]; this function clips them to the desired range.
 def clip01(c): return tuple(1 if p > 1 else (0 if p < 0 else p) for p in c)
 
@@ -287,3 +310,88 @@ def alphatint(back1, comp1, back2, comp2):
         out.append((c1 + c2) / 2)
     out.append(ta)
     return clip01(out)
+
+# Array versions of the above, which take and return NumPy arrays of colours whose last axis has the four components (e.g. N × 4 arrays).
+# Arguments broadcast against each other, so one background can be given for many tints. Nearness tests are those of math.isclose.
+rgbmat = ((3.2406, -1.5372, -.4986), (-.9689, 1.8758, .0415), (.0557, -.2040, 1.0570))
+xyzmat = ((.4123955889674142, .3575834307637148, .18049264738170157),
+          (.21258623078559552, .7151703037034108, .07220049864333623),
+          (.019297215491746945, .11918386458084852, .9504971251315797))
+def closes(a, b): return np.abs(a - b) <= 1e-9 * np.maximum(np.abs(a), np.abs(b))
+def rgb_lins(k): return np.where(k <= 0.040449936, k / 12.92, ((np.abs(k) + 0.055) / 1.055) ** 2.4)
+def rgb_invs(k): return np.where(k <= 0.0031308, 12.92 * k, 1.055 * np.abs(k) ** (1 / 2.4) - 0.055)
+def lumroots(k): return np.where(k > 216 / 24389, np.cbrt(k), k * 841 / 108 + 4 / 29)
+def lumcubes(k): return np.where(k > 6 / 29, k ** 3, 108 / 841 * (k - 4 / 29))
+def withalpha(c, a): return np.concatenate((c, np.broadcast_to(a, c.shape[:-1] + (1,))), -1)
+def xyz2rgbs(c):
+    c = np.asarray(c, float)
+    return withalpha(rgb_invs(c[..., :3] @ np.array(rgbmat).T), c[..., 3:])
+def rgb2xyzs(c):
+    c = np.asarray(c, float)
+    return withalpha(rgb_lins(c[..., :3]) @ np.array(xyzmat).T, c[..., 3:])
+def xyz2labs(c):
+    c = np.asarray(c, float)
+    f = lumroots(c[..., :3] / (xn, yn, zn))
+    return np.stack((116 * f[..., 1] - 16, 500 * (f[..., 0] - f[..., 1]), 200 * (f[..., 1] - f[..., 2]), c[..., 3]), -1)
+def lab2xyzs(c):
+    c = np.asarray(c, float)
+    l0 = (c[..., 0] + 16) / 116
+    return np.stack((xn * lumcubes(l0 + c[..., 1] / 500), yn * lumcubes(l0), zn * lumcubes(l0 - c[..., 2] / 200), c[..., 3]), -1)
+def rgb2labs(c): return xyz2labs(rgb2xyzs(c))
+def lab2rgbs(c): return xyz2rgbs(lab2xyzs(c))
+def clip01s(c): return np.clip(c, 0, 1)
+
+def alphacomps(back, tint):
+    back, tint = np.asarray(back, float), np.asarray(tint, float)
+    ba, ta = back[..., 3:], tint[..., 3:]
+    resa = ba * (1 - ta) + ta
+    zero = resa == 0
+    with np.errstate(divide="ignore", invalid="ignore"): rgb = (tint[..., :3] * ta + back[..., :3] * ba * (1 - ta)) / resa
+    return np.where(zero, 0, clip01s(withalpha(rgb, resa)))
+def alphabacks(tint, comp):
+    tint, comp = np.asarray(tint, float), np.asarray(comp, float)
+    ta, ca = tint[..., 3:], comp[..., 3:]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        res = clip01s(withalpha((comp[..., :3] * ca - tint[..., :3] * ta) / (ca - ta), (ca - ta) / (1 - ta)))
+    res = np.where(closes(ta, ca), 0, res)
+    return np.where(closes(ta, 1), (0, 0, 0, 1), res)
+def alphatints(back1, comp1, back2, comp2):
+    back1, comp1, back2, comp2 = np.broadcast_arrays(*(np.asarray(c, float) for c in (back1, comp1, back2, comp2)))
+    k1, k2 = (comp1[..., :3] - back1[..., :3]) * comp1[..., 3:], (comp2[..., :3] - back2[..., :3]) * comp2[..., 3:]
+    db, used = back1[..., :3] - back2[..., :3], ~closes(back1[..., :3], back2[..., :3])
+    p = used.sum(-1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ta = np.where(used, (k2 - k1) / db, 0).sum(-1, keepdims=True) / p
+        res = clip01s(withalpha(((k1 + k2) / ta + back1[..., :3] + back2[..., :3]) / 2, ta))
+    res = np.where(ta == 0, 0, res)
+    return np.where(p == 0, (0, 0, 0, 0.5), res)
+
+# Least-squares tints: with u = S_A * S and v = S_A, every channel of every background/composite pair gives the equation u - B * v = K,
+# K = (R - B) * R_A being as in alphatint(). The normal equations then solve in closed form: v is minus the (weighted) covariance of B and K
+# over the variance of B, both summed over the primaries, and S = mean(K) / v + mean(B). Pairs whose residuals exceed cut times a robust
+# estimate of their spread (1.4826 times the lower median residual) are dropped and the fit repeated, up to rounds times.
+def alphatintlsq(backs, comps, weights = None, cut = 3, rounds = 3):
+    """The tint that best turns the backgrounds into the composites, from arrays of shape (..., N, 4) holding N pairs per problem
+    (weights, if given, of shape (..., N)). Returns an array of shape (..., 4); degenerate problems give what alphatint() gives."""
+    backs, comps = np.broadcast_arrays(np.asarray(backs, float), np.asarray(comps, float))
+    w = np.ones(backs.shape[:-1]) if weights is None else np.broadcast_to(np.asarray(weights, float), backs.shape[:-1])
+    b, k = backs[..., :3], (comps[..., :3] - backs[..., :3]) * comps[..., 3:]
+    keep = w > 0
+    for r in range(rounds + 1):
+        ww = np.where(keep, w, 0)[..., None]
+        tot = ww.sum(-2)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mb, mk = (ww * b).sum(-2) / tot, (ww * k).sum(-2) / tot
+            var = (ww * (b - mb[..., None, :]) ** 2).sum((-2, -1))
+            cov = (ww * (b - mb[..., None, :]) * (k - mk[..., None, :])).sum((-2, -1))
+            v = np.where(var > 0, -cov / var, 0)
+        if r == rounds: break
+        res = np.sqrt(((k - mk[..., None, :] + v[..., None, None] * (b - mb[..., None, :])) ** 2).sum(-1))
+        mid = np.maximum(keep.sum(-1, keepdims=True) - 1, 0) // 2
+        spread = 1.4826 * np.take_along_axis(np.sort(np.where(keep, res, np.inf), -1), mid, -1)
+        new = keep & (res <= cut * spread + 1e-12)
+        if (new == keep).all(): break
+        keep = new
+    with np.errstate(divide="ignore", invalid="ignore"): res = clip01s(withalpha(mk / v[..., None] + mb, v[..., None]))
+    res = np.where(closes(v, 0)[..., None], 0, res)
+    return np.where(~(var > 1e-12 * tot[..., 0])[..., None], (0, 0, 0, 0.5), res)
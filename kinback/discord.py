@@ -5,18 +5,65 @@ import random
 from math import sqrt, log, ceil, pi
 from cmath import rect
 from .algebra import linterp
+try: import numpy as np
+except ImportError: np = None
 T = 2 * pi
 BDG, BDL, BDU = sqrt(2) / 2, sqrt(2) - 1, 2 - sqrt(2) # constants for the Bridson-disc algorithm
 
 # SystemRandom is good enough for simulation and pretty pictures, but here I add a few more useful functions, especially discrete distributions.
 # Page numbers below refer to Luc Devroye's book on Non-Uniform Random Variate Generation (http://luc.devroye.org/rnbookindex.html).
-class KinrossRandom(random.SystemRandom):
-    def geometricvariate(self, p = 0):
+# The uniform source is pluggable: "system" (os.urandom, the default), "mt" (a seedable Mersenne Twister) or "pcg" (NumPy's PCG64 Generator, also seedable).
+# Everything else is built on random() and getrandbits(), so all the variates below work the same way on every backend.
+backends = ("system", "mt", "pcg")
+class KinrossRandom(random.Random):
+    def __init__(self, backend = "system", seed = None):
+        self.backend = backend
+        super().__init__(seed)
+    def seed(self, a = None, version = 2):
+        """Reseeds the backend; the system source cannot be seeded and ignores a."""
+        if self.backend == "system": self.src = random.SystemRandom()
+        elif self.backend == "mt": self.src = random.Random(a)
+        elif self.backend == "pcg":
+            if np == None: raise ImportError("the pcg backend requires NumPy")
+            self.src = np.random.Generator(np.random.PCG64(a))
+        else: raise ValueError("unknown backend {} (choose from {})".format(self.backend, ", ".join(backends)))
+        self.gauss_next, self.npsrc = None, None
+        # Binding the source's own random() to the instance skips a Python-level call on every uniform variate
+        self.random = self.src.random
+        if self.backend != "pcg": self.getrandbits = self.src.getrandbits
+        else: self.__dict__.pop("getrandbits", 0)
+    def npgen(self):
+        """The NumPy Generator behind the batch (size=) variates: the source itself on the pcg backend, otherwise one seeded
+        from this generator's bits, so that seeding the mt backend also fixes its batches."""
+        if np == None: raise ImportError("batch variates require NumPy")
+        if self.backend == "pcg": return self.src
+        if self.npsrc == None: self.npsrc = np.random.Generator(np.random.PCG64(self.getrandbits(128)))
+        return self.npsrc
+    def setbackend(self, backend, seed = None):
+        """Switches this generator to another backend, seeded with seed."""
+        self.backend = backend
+        self.seed(seed)
+    def random(self): return self.src.random()
+    def getrandbits(self, k):
+        if self.backend != "pcg": return self.src.getrandbits(k)
+        return int.from_bytes(self.src.bytes((k + 7) // 8), "little") >> (-k % 8) if k else 0
+    def getstate(self): return self.backend, (self.src.bit_generator.state if self.backend == "pcg" else self.src.getstate()), self.gauss_next
+    def setstate(self, state):
+        if state[0] != self.backend: self.setbackend(state[0])
+        st, self.gauss_next = state[1:]
+        if self.backend == "pcg": self.src.bit_generator.state = st
+        else: self.src.setstate(st)
+    
+    def geometricvariate(self, p = 0, size = None):
         """Geometric distribution with probability of success p. Here we use the number of trials before first failure;
-        this is equivalent to flooring the exponential distribution with parameter -ln(1 - p). p defaults to 0.5."""
-        return int(self.expovariate(log(2) if not 0 < p < 1 else -log(1 - p)))
-    def gammavariate(self, k, theta):
-        """Gamma distribution using Marsaglia and Tsang's method. Parameters and operation follow the GSL code for this same distribution."""
+        this is equivalent to flooring the exponential distribution with parameter -ln(1 - p). p defaults to 0.5. size works as for gammavariate()."""
+        lam = log(2) if not 0 < p < 1 else -log(1 - p)
+        if size != None: return (self.npgen().standard_exponential(size) / lam).astype(np.int64)
+        return int(self.expovariate(lam))
+    def gammavariate(self, k, theta, size = None):
+        """Gamma distribution using Marsaglia and Tsang's method. Parameters and operation follow the GSL code for this same distribution.
+        If size (a number or shape) is given, a NumPy array of variates is returned instead; the same goes for the binomial and Poisson distributions."""
+        if size != None: return gammabatch(self.npgen(), np.full(size, k, float).ravel(), theta).reshape(size)
         if k < 1: return self.gammavariate(k + 1, theta) * (1 - self.random()) ** (1 / k)
         d = k - 1 / 3
         c = 1 / 3 / sqrt(d)
@@ -32,8 +79,9 @@ class KinrossRandom(random.SystemRandom):
     def kumaraswamyvariate(self, a, b):
         """Kumaraswamy distribution, an easy-to-sample approximation of the beta distribution. CDF is 1 - (1 - x ** a) ** b."""
         return (1 - (1 - self.random()) ** (1 / b)) ** (1 / a)
-    def binomialvariate(self, num, prob):
+    def binomialvariate(self, num, prob, size = None):
         """Binomial distribution with num trials and probability prob of success."""
+        if size != None: return binomialbatch(self.npgen(), np.full(size, num, np.int64).ravel(), np.full(size, prob, float).ravel()).reshape(size)
         if prob == 0.5: return bin(self.getrandbits(num)).count('1')
         n, p = num, prob
         res = 0 # Relles's recursive method (1972, hinted on p. 538)
@@ -56,8 +104,9 @@ class KinrossRandom(random.SystemRandom):
                 x += 1
         except ZeroDivisionError: x += 1
         return res + x - 1
-    def poissonvariate(self, mean):
+    def poissonvariate(self, mean, size = None):
         """Poisson distribution with the given mean."""
+        if size != None: return poissonbatch(self.npgen(), np.full(size, mean, float).ravel()).reshape(size)
         m, r = mean, 0 # Ahrens/Dieter recursive method, p. 518
         while m > 12:
             n = int(0.875 * m)
@@ -70,6 +119,78 @@ class KinrossRandom(random.SystemRandom):
             k += 1
         return r + k
 
+# Batch versions of the methods above for the NumPy Generator g, taking 1-D arrays of parameters (one per variate).
+# Each rejection loop keeps the indices of the lanes still rejected and only redraws those.
+def gammabatch(g, k, theta):
+    small = k < 1
+    d = np.where(small, k + 1, k) - 1 / 3
+    c = 1 / 3 / np.sqrt(d)
+    out, todo = np.empty(k.size), np.arange(k.size)
+    while todo.size:
+        x = g.standard_normal(todo.size)
+        v = 1 + c[todo] * x
+        pos = v > 0
+        v = np.where(pos, v, 1) ** 3
+        u = 1 - g.random(todo.size)
+        acc = pos & ((u < 1 - 0.0331 * x ** 4) | (np.log(u) < 0.5 * x * x + d[todo] * (1 - v + np.log(v))))
+        out[todo[acc]] = d[todo[acc]] * v[acc]
+        todo = todo[~acc]
+    if small.any(): out[small] *= (1 - g.random(np.count_nonzero(small))) ** (1 / k[small])
+    return out * theta
+def binomialbatch(g, num, prob):
+    n, p, res = num.copy(), prob.copy(), np.zeros(num.size, np.int64)
+    act = np.flatnonzero(n > 16) # Relles's recursion, one halving per round on the lanes that still need it
+    while act.size:
+        ev = act[n[act] & 1 == 0]
+        n[ev] -= 1
+        res[ev] += g.random(ev.size) < p[ev]
+        n[act] >>= 1
+        u, v, need = np.empty(act.size), np.empty(act.size), np.arange(act.size)
+        while need.size: # Beta variate shortcut
+            uu, vv = g.random(need.size), 2 * g.random(need.size) - 1
+            ok = uu * uu + vv * vv <= 1
+            u[need[ok]], v[need[ok]] = uu[ok], vv[ok]
+            need = need[~ok]
+        z, nn = u * u + v * v, n[act]
+        bv = u * v * np.sqrt(1 - z ** (2 / (2 * nn + 1))) / z + 0.5
+        lo = bv < p[act]
+        a1, a2 = act[lo], act[~lo]
+        res[a1] += nn[lo] + 1
+        p[a1] = (p[a1] - bv[lo]) / (1 - bv[lo])
+        p[a2] /= bv[~lo]
+        act = act[n[act] > 16]
+    q, x, s = -np.log1p(-p), np.zeros(n.size, np.int64), np.zeros(n.size) # Second waiting-time method
+    act = np.arange(n.size)
+    while act.size:
+        left = n[act] - x[act]
+        x[act] += 1
+        act = act[left > 0]
+        s[act] += g.standard_exponential(act.size) / left[left > 0]
+        act = act[s[act] <= q[act]]
+    return res + x - 1
+def poissonbatch(g, mean):
+    m, r, out, done = mean.copy(), np.zeros(mean.size, np.int64), np.empty(mean.size, np.int64), np.zeros(mean.size, bool)
+    act = np.flatnonzero(m > 12) # Ahrens/Dieter recursion
+    while act.size:
+        n = (0.875 * m[act]).astype(np.int64)
+        gv = gammabatch(g, n.astype(float), 1)
+        big = gv > m[act]
+        b, sm = act[big], act[~big]
+        out[b] = r[b] + binomialbatch(g, n[big] - 1, m[b] / gv[big])
+        done[b] = True
+        r[sm] += n[~big]
+        m[sm] -= gv[~big]
+        act = sm[m[sm] > 12]
+    rest = np.flatnonzero(~done)
+    s, k = np.zeros(rest.size), np.full(rest.size, -1, np.int64)
+    live = np.flatnonzero(s < m[rest])
+    while live.size:
+        s[live] += g.standard_exponential(live.size)
+        k[live] += 1
+        live = live[s[live] < m[rest[live]]]
+    out[rest] = r[rest] + k
+    return out
+
 # The following functions rely on an instance of the Kinross generator, here named rng.
 rng = KinrossRandom()
 def rectpointpick(c2 = 1+1j, c1 = 0):
@@ -84,17 +205,131 @@ def trianglepointpick(v1 = 1, v2 = 1j, o = 0):
     if t1 + t2 > 1: t1, t2 = 1 - t1, 1 - t2
     return o + v1 * t1 + v2 * t2
 
-def bridsondisc(c2 = 64+64j, r = 1, c1 = 0):
+# Bridson's algorithm on NumPy arrays. Grid cells have side r / sqrt(2), so each holds one point at most; the grid is a pair of flat arrays of coordinates
+# (infinite for empty cells), padded by three cells on every side so that the 20 cells that can hold a point within r of a candidate (and the 48 within 2r)
+# are always fixed offsets from its own, and active points are kept as their cells. Each round takes up to BDB active points, throws k candidates around each and tests them all at once,
+# nearest cells first. Passing candidates may still clash with each other: a candidate is kept if it comes first in its cell and no earlier
+# first-in-cell candidate in a neighbouring cell is within r. As in the original algorithm, an active point retires when none of its candidates pass.
+BDO = sorted(((dy, dx) for dy in range(-2, 3) for dx in range(-2, 3) if 0 < abs(dy) + abs(dx) < 4), key=lambda o: max(abs(o[0]), abs(o[1])))
+BDB = 512
+def bridsonrounds(g, w, h, r, k = 32, fixed = None, within = None, seeder = None):
+    """Bridson's algorithm over the rectangle from 0 to w + hj with the NumPy Generator g, yielding the coordinate arrays (x, y) of the points found in each round.
+    fixed is an optional pair of coordinate arrays of points already placed in or within r of the rectangle; the new points keep clear of them and grow from them.
+    within, if given, maps coordinate arrays to a mask of the points allowed (to fill some region of the rectangle), and seeder(n) returns n random points
+    of the rectangle (by default uniform) to start from. Whenever the active points run out, sampling restarts from the first of BDB * k such points
+    that is more than 2r from the rest, and so out of the fronts' reach, so that every part of a region gets filled; it ends when there is none."""
+    msh, r2 = r * BDG, r * r
+    nx, ny = ceil(w / msh), ceil(h / msh)
+    W = nx + 6
+    gx, gy = np.full((ny + 6) * W, np.inf), np.full((ny + 6) * W, np.inf)
+    near, far = np.array([dy * W + dx for dy, dx in BDO[:8]]), np.array([dy * W + dx for dy, dx in BDO[8:]])
+    offs, reach = np.concatenate((near, far)), np.array([dy * W + dx for dy in range(-3, 4) for dx in range(-3, 4)])
+    if seeder == None: seeder = lambda n: (w * g.random(n), h * g.random(n))
+    def cellsof(cx, cy): return (np.floor(cy / msh).astype(np.int64) + 3) * W + np.floor(cx / msh).astype(np.int64) + 3
+    def clear(i, cx, cy, offs, d2 = r2):
+        nb = cells[i, None] + offs
+        dx, dy = gx[nb] - cx[i, None], gy[nb] - cy[i, None]
+        return i[(dx * dx + dy * dy >= d2).all(1)]
+    active = np.zeros(0, np.int64)
+    if fixed != None and len(fixed[0]):
+        fx, fy = np.asarray(fixed[0], float), np.asarray(fixed[1], float)
+        active = cellsof(fx, fy)
+        gx[active], gy[active] = fx, fy
+    while True:
+        if not active.size:
+            cx, cy = seeder(BDB * k)
+            if within != None:
+                m = within(cx, cy)
+                cx, cy = cx[m], cy[m]
+            cells = cellsof(cx, cy)
+            ok = clear(clear(np.flatnonzero(gx[cells] == np.inf), cx, cy, near, 4 * r2), cx, cy, reach, 4 * r2)[:1]
+            if not ok.size: return
+            gx[cells[ok]], gy[cells[ok]], active = cx[ok], cy[ok], cells[ok]
+            yield cx[ok], cy[ok]
+        while active.size:
+            pick = active if active.size <= BDB else g.choice(active, BDB, replace=False)
+            piv = np.repeat(pick, k)
+            rad, ang = np.sqrt(g.uniform(r2, 4 * r2, piv.size)), g.uniform(0, T, piv.size)
+            cx, cy = gx[piv] + rad * np.cos(ang), gy[piv] + rad * np.sin(ang)
+            inside = np.flatnonzero((cx >= 0) & (cx < w) & (cy >= 0) & (cy < h))
+            if within != None: inside = inside[within(cx[inside], cy[inside])]
+            cx, cy, piv = cx[inside], cy[inside], piv[inside]
+            cells = cellsof(cx, cy)
+            ok = np.flatnonzero(gx[cells] == np.inf)
+            ok = clear(clear(ok, cx, cy, near), cx, cy, far)
+            active = active[~np.isin(active, np.setdiff1d(pick, piv[ok]))]
+            cx, cy, cells = cx[ok], cy[ok], cells[ok]
+            wcell, first = np.unique(cells, return_index=True) # the earliest passing candidate in each cell, by cell
+            nbc = wcell[:, None] + offs
+            at = np.minimum(np.searchsorted(wcell, nbc), wcell.size - 1)
+            rival = np.where(wcell[at] == nbc, first[at], ok.size) # neighbouring cells' first candidates (or none)
+            rx, ry = np.append(cx, np.inf)[rival] - cx[first, None], np.append(cy, np.inf)[rival] - cy[first, None]
+            keep = np.sort(first[~((rival < first[:, None]) & (rx * rx + ry * ry < r2)).any(1)])
+            gx[cells[keep]], gy[cells[keep]] = cx[keep], cy[keep]
+            active = np.concatenate((active, cells[keep]))
+            if keep.size: yield cx[keep], cy[keep]
+
+def bridsondisc(c2 = 64+64j, r = 1, c1 = 0, max_points = None, k = 32):
     """Poisson-samples the given rectangular region with all distances between points at least r using Bridson's algorithm.
-    My empirical tests show the number of circles generated as approximately 0.679 * area / radius^2; since this balloons very fast, the procedure here is a generator."""
+    My empirical tests show the number of circles generated as approximately 0.679 * area / radius^2; since this balloons very fast, the procedure here is a generator.
+    It stops after max_points points if that is given; k is the number of candidates tried around each active point. Without NumPy this is bridsonlists()."""
+    if np == None:
+        yield from bridsonlists(c2, r, c1, max_points)
+        return
+    rvec, n = c2 - c1, 0
+    sx, sy = -1 if rvec.real < 0 else 1, -1 if rvec.imag < 0 else 1
+    for x, y in bridsonrounds(rng.npgen(), abs(rvec.real), abs(rvec.imag), r, k):
+        for x, y in zip(x.tolist(), y.tolist()):
+            yield c1 + complex(x * sx, y * sy)
+            n += 1
+            if n == max_points: return
+
+# Tiled sampling for huge canvases. Tiles are coloured in a 2 × 2 pattern and sampled colour by colour; tiles of one colour are at least a tile apart,
+# so they can be sampled in parallel, each growing from the points of the already sampled tiles within r of it. Every tile has its own stream
+# seeded from (seed, column, row), which makes the points independent of the number and scheduling of the workers.
+def disctile(job):
+    seed, i, j, x0, y0, w, h, r, k, fx, fy = job
+    g = np.random.Generator(np.random.PCG64(np.random.SeedSequence([seed, i, j])))
+    res = [(fx[:0], fy[:0])] + list(bridsonrounds(g, w, h, r, k, (fx - x0, fy - y0))) # small tiles may be covered already
+    return np.concatenate([p[0] for p in res]) + x0, np.concatenate([p[1] for p in res]) + y0
+def tileddisc(c2 = 64+64j, r = 1, c1 = 0, tile = None, jobs = None, seed = None, k = 32):
+    """bridsondisc() for poster-sized canvases, cut into tiles of side tile (by default 128r) that are sampled in jobs worker processes
+    (by default one per CPU; 1 samples them here). The minimum distance holds across tile edges. Points come out tile by tile and are fixed by seed,
+    which is drawn from rng if not given."""
+    from concurrent.futures import ProcessPoolExecutor
+    rvec = c2 - c1
+    sx, sy, w, h = -1 if rvec.real < 0 else 1, -1 if rvec.imag < 0 else 1, abs(rvec.real), abs(rvec.imag)
+    tile = max(tile or 128 * r, r)
+    nx, ny = ceil(w / tile), ceil(h / tile)
+    if seed == None: seed = rng.getrandbits(64)
+    done, empty = {}, (np.zeros(0), np.zeros(0))
+    def border(i, j):
+        x0, y0 = i * tile, j * tile
+        fx, fy = (np.concatenate(c) for c in zip(*(done.get((a, b), empty) for a in (i - 1, i, i + 1) for b in (j - 1, j, j + 1))))
+        near = (fx > x0 - r) & (fx < x0 + tile + r) & (fy > y0 - r) & (fy < y0 + tile + r)
+        return fx[near], fy[near]
+    pool = ProcessPoolExecutor(jobs) if jobs != 1 else None
+    try:
+        for ph in ((0, 0), (1, 0), (0, 1), (1, 1)):
+            tiles = [(i, j) for j in range(ph[1], ny, 2) for i in range(ph[0], nx, 2)]
+            work = [(seed, i, j, i * tile, j * tile, min(tile, w - i * tile), min(tile, h - j * tile), r, k) + border(i, j) for i, j in tiles]
+            for ij, pts in zip(tiles, (pool.map if pool else map)(disctile, work)):
+                done[ij] = pts
+                for x, y in zip(pts[0].tolist(), pts[1].tolist()): yield c1 + complex(x * sx, y * sy)
+    finally:
+        if pool: pool.shutdown()
+
+def bridsonlists(c2 = 64+64j, r = 1, c1 = 0, max_points = None):
+    """bridsondisc() on nested lists of complex numbers, one candidate at a time; kept for systems without NumPy."""
     rvec, msh, r2 = c2 - c1, r * BDG, r * r # http://www.cs.ubc.ca/~rbridson/docs/bridson-siggraph07-poissondisk.pdf
     sense_x, sense_y, w, h = -1 if rvec.real < 0 else 1, -1 if rvec.imag < 0 else 1, abs(rvec.real), abs(rvec.imag)
     nx, ny = ceil(w / msh), ceil(h / msh)
     grid = [[None for q in range(nx)] for q in range(ceil(ny))]
     p0 = complex(w * rng.random(), h * rng.random())
     g0 = (int(p0.imag / msh), int(p0.real / msh))
-    active = [p0]
+    active, count = [p0], 1
     yield c1 + complex(p0.real * sense_x, p0.imag * sense_y)
+    if count == max_points: return
     grid[g0[0]][g0[1]] = p0
     def faraway(b, dy, dx):
         fy, fx = b[1][0] + dy, b[1][1] + dx
@@ -132,5 +367,7 @@ def bridsondisc(c2 = 64+64j, r = 1, c1 = 0):
             active.append(cup[0])
             yield c1 + complex(cup[0].real * sense_x, cup[0].imag * sense_y)
             grid[cup[1][0]][cup[1][1]] = cup[0]
+            count += 1
+            if count == max_points: return
         else: del active[sel]
     return
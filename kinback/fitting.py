@@ -0,0 +1,154 @@
+# Helper functions for Kinross: least-squares Bézier fitting and path simplification
+# Parcly Taxel / Jeremy Tan, 2016
+# https://parclytaxel.tumblr.com
+from .algebra import dot
+from .segment import bezier, ellipt
+from .pathery import path
+
+# Cubics in this module are plain 4-lists of complex numbers; bezier objects are only made for output, since their polynomials are costly to set up.
+def cubicat(q, t):
+    s = 1 - t
+    return s * s * s * q[0] + 3 * s * t * (s * q[1] + t * q[2]) + t * t * t * q[3]
+def cubicd(q, t):
+    s = 1 - t
+    return 3 * (s * s * (q[1] - q[0]) + 2 * s * t * (q[2] - q[1]) + t * t * (q[3] - q[2]))
+def cubicdd(q, t): return 6 * ((1 - t) * (q[2] - 2 * q[1] + q[0]) + t * (q[3] - 2 * q[2] + q[1]))
+def cubicpart(q, a, b):
+    """The control points of the cubic q between the parameters a and b, from its value and derivatives at a."""
+    c1, c2, c3 = 3 * (q[1] - q[0]), 3 * (q[2] - 2 * q[1] + q[0]), q[3] - 3 * (q[2] - q[1]) - q[0]
+    h = b - a
+    v, d, e = q[0] + a * (c1 + a * (c2 + a * c3)), h * (c1 + a * (2 * c2 + 3 * a * c3)), h * h * (c2 + 3 * a * c3)
+    return [v, v + d / 3, v + (2 * d + e) / 3, v + d + e + h * h * h * c3]
+def ascubic(p):
+    """The control points of the Bézier curve with control points p (a line, quadratic or cubic) as a cubic."""
+    if len(p) == 2: return [p[0], (2 * p[0] + p[1]) / 3, (p[0] + 2 * p[1]) / 3, p[1]]
+    if len(p) == 3: return [p[0], (p[0] + 2 * p[1]) / 3, (2 * p[1] + p[2]) / 3, p[2]]
+    return list(p)
+def unit(z):
+    a = abs(z)
+    return z / a if a else 0j
+
+def chordparams(pts):
+    """Chord-length parameters of the points, running from 0 to 1. Linear time, unlike the sum-of-slices version in Flevobézier."""
+    u, run = [0.0], 0
+    for i in range(1, len(pts)):
+        run += abs(pts[i] - pts[i - 1])
+        u.append(run)
+    if not run: return [i / (len(pts) - 1) for i in range(len(pts))]
+    return [x / run for x in u]
+def segtangent(seg, t):
+    """Unit tangent of the segment at parameter t, falling back to the control polygon where the derivative vanishes."""
+    v = unit(seg.d(t))
+    if v or type(seg) == ellipt: return v
+    p = seg.p if t < 0.5 else seg.p[::-1]
+    for q in p[1:]:
+        if q != p[0]: return unit(q - p[0]) * (1 if t < 0.5 else -1)
+    return 0j
+
+def lsqcubic(pts, u, t0, t1):
+    """Least-squares cubic through the first and last points with unit tangents t0 (leaving the start) and t1 (arriving at the end),
+    the handle lengths solving the normal equations for the parameters u (Schneider, Graphics Gems, 1990)."""
+    p0, p3 = pts[0], pts[-1]
+    c00 = c01 = c11 = x0 = x1 = 0
+    for p, t in zip(pts, u):
+        s = 1 - t
+        b1, b2 = 3 * s * s * t, 3 * s * t * t
+        a0, a1 = t0 * b1, -t1 * b2
+        r = p - (s * s * s + b1) * p0 - (b2 + t * t * t) * p3
+        c00 += dot(a0, a0)
+        c01 += dot(a0, a1)
+        c11 += dot(a1, a1)
+        x0 += dot(a0, r)
+        x1 += dot(a1, r)
+    det, span = c00 * c11 - c01 * c01, abs(p3 - p0)
+    l0 = l1 = 0
+    if abs(det) > 1e-12 * (c00 * c11 + 1e-300):
+        l0, l1 = (x0 * c11 - x1 * c01) / det, (c00 * x1 - c01 * x0) / det
+    if l0 < 1e-6 * span or l1 < 1e-6 * span: l0 = l1 = span / 3 # degenerate or backwards handles fall back to Hermite-ish thirds
+    return [p0, p0 + l0 * t0, p3 - l1 * t1, p3]
+def reparam(q, pts, u):
+    """One Newton–Raphson step moving each parameter towards the projection of its point onto the cubic q."""
+    res = []
+    for p, t in zip(pts, u):
+        d, d1, d2 = cubicat(q, t) - p, cubicd(q, t), cubicdd(q, t)
+        den = dot(d1, d1) + dot(d, d2)
+        if den: t -= dot(d, d1) / den
+        res.append(min(max(t, 0), 1))
+    return res
+def fiterror(q, pts, u, pieces, tol):
+    """An upper bound of the distance between the cubic q and the original curve, with the inner point nearest where it is largest.
+    pieces[i] is the original curve between pts[i] and pts[i + 1] as a cubic; matching it with q between u[i] and u[i + 1], parameter for parameter,
+    makes their difference a cubic too, which lies in the hull of its control points. So no point of either curve is further from the other than the bound.
+    The distances at the points, which the bound cannot be below, are returned instead if they already exceed tol."""
+    worst, at = 0, len(pts) // 2
+    for i in range(1, len(pts) - 1):
+        e = abs(cubicat(q, u[i]) - pts[i])
+        if e > worst: worst, at = e, i
+    if worst > tol: return worst, at
+    for i, c in enumerate(pieces): # the ends of the difference are the distances at the points
+        r = cubicpart(q, u[i], u[i + 1])
+        e = max(abs(r[1] - c[1]), abs(r[2] - c[2]))
+        if e > worst: worst, at = e, max(i, 1)
+    return worst, at
+
+def fitcubics(pts, tans, pieces, tol, retries = 4):
+    """Fits a G1 spline of cubics to the points, whose unit tangents are tans, within tol of the original curve given as pieces (see fiterror).
+    The run is split next to its worst piece whenever a single cubic cannot do it; cubics whose chords are as close are returned as lines (2-lists).
+    None is returned if the points are too sparse for the tolerance to be met."""
+    def done(q, u):
+        line = ascubic([q[0], q[3]])
+        return [[q[0], q[3]] if fiterror(line, pts, u, pieces, tol)[0] <= tol else q]
+    if len(pts) == 2:
+        l = abs(pts[1] - pts[0]) / 3
+        q = [pts[0], pts[0] + tans[0] * l, pts[1] - tans[1] * l, pts[1]]
+        return done(q, [0, 1]) if fiterror(q, pts, [0, 1], pieces, tol)[0] <= tol else None
+    u = chordparams(pts)
+    q = lsqcubic(pts, u, tans[0], tans[-1])
+    err, at = fiterror(q, pts, u, pieces, tol)
+    if err <= tol: return done(q, u)
+    if err <= 4 * tol:
+        for k in range(retries):
+            u = reparam(q, pts, u)
+            q = lsqcubic(pts, u, tans[0], tans[-1])
+            err, at = fiterror(q, pts, u, pieces, tol)
+            if err <= tol: return done(q, u)
+    left = fitcubics(pts[:at + 1], tans[:at + 1], pieces[:at], tol, retries)
+    right = left and fitcubics(pts[at:], tans[at:], pieces[at:], tol, retries)
+    return right and left + right
+
+def simplifyrun(run, tol, density = 4):
+    """Refits a run of G1-continuous segments into as few cubics as fitcubics() can manage; the run is returned unchanged if that does not help.
+    Each segment is cut into density pieces, whose ends are the points fitted."""
+    if len(run) < 2: return run
+    pts, tans, pieces = [], [], []
+    for seg in run:
+        c = ascubic(seg.p)
+        for j in range(density):
+            pts.append(seg(j / density))
+            tans.append(segtangent(seg, j / density))
+            pieces.append(cubicpart(c, j / density, (j + 1) / density))
+    pts.append(run[-1](1))
+    tans.append(segtangent(run[-1], 1))
+    res = fitcubics(pts, tans, pieces, tol)
+    if not res or len(res) >= len(run): return run
+    return [bezier(*q) for q in res]
+def simplify(p, tol, corner = 0.99):
+    """Simplifies the path p, refitting every run of smoothly joined segments within tol of the original: no point of either path is further than tol
+    from the other (see fiterror). Segments meeting at a corner (the cosine of the angle between their tangents is below corner) and elliptical arcs
+    are kept as they are. Returns a new path."""
+    res = path("")
+    res.closed = p.closed[:]
+    for sp in p.segments:
+        out, run = [], []
+        for seg in sp:
+            if type(seg) == ellipt:
+                out += simplifyrun(run, tol) + [seg]
+                run = []
+                continue
+            if run and dot(segtangent(run[-1], 1), segtangent(seg, 0)) < corner:
+                out += simplifyrun(run, tol)
+                run = []
+            run.append(seg)
+        res.segments.append(out + simplifyrun(run, tol))
+    return res
+def nodecount(p): return sum(len(sp) + 1 for sp in p.segments)
@@ -0,0 +1,215 @@
+# Helper functions for Kinross: Flevobézier, fitting Bézier curves to strings of nodes (see programs/flevodoc)
+# Parcly Taxel / Jeremy Tan, 2015–2016
+# https://parclytaxel.tumblr.com
+from math import pi, acos
+from cmath import rect, phase
+from .algebra import linterp, dot, Pol
+from .segment import bezier
+from .pathery import path
+from .fitting import chordparams as chords, cubicat, cubicd, cubicdd
+
+# The main algorithm! Yay! Nodes are complex numbers; the result is the list of nodes and handles of the fitted cubics, the closing node included.
+def flevobezier(points, z):
+    if len(points) < 2: raise ValueError("a curve isn't a point, silly!")
+    res = []
+    prevtrail, trail, lead, window = 0, 0, 1, points[:2] # Start with first two points
+    maybeover = False # Over by error followed by over by angle -> backup
+    curcurve = line3(window[0], window[1]) # Current working curve, always a 4-list
+    while lead + 1 < len(points):
+        lead += 1
+        window = points[trail:lead + 1] # Extend the window one more node
+        v, w = window[-3] - window[-2], window[-1] - window[-2]
+        if dot(v, w) / abs(v) / abs(w) >= 0.5: # 60 degrees or less, over by angle
+            if maybeover: # backup
+                newcurve = stress(points[prevtrail:lead])[0]
+                res[-3:] = newcurve[1:] # replace the last three nodes in res with those of newcurve
+                maybeover = False
+            else:
+                if not res: res += curcurve[:1]
+                res += curcurve[1:]
+                prevtrail = trail
+            trail = lead - 1
+            window = points[trail:lead + 1]
+            curcurve = line3(window[0], window[1])
+        else: # then see what to do based on how long the window is
+            over = False
+            if len(window) == 3: # Quadratic curve on three nodes stepped to a cubic
+                t = chords(window)[1]
+                qc = (window[1] - (1 - t) * (1 - t) * window[0] - t * t * window[2]) / (2 * t * (1 - t))
+                newcurve = [window[0], linterp(window[0], qc, 2 / 3), linterp(qc, window[2], 1 / 3), window[2]]
+            elif len(window) == 4: newcurve = cubicfrom4(window) # Cubic curve on four nodes
+            else: # Stress
+                product = stress(window)
+                shortseg = min(abs(window[i + 1] - window[i]) for i in range(len(window) - 1))
+                # Stop condition: maximum error > 1 / 3 * minimum segment length
+                if max(product[1]) > 0.33 * shortseg: over = True
+                else: newcurve = product[0]
+            if over: # Over by error bound
+                maybeover = True
+                if not res: res += curcurve[:1]
+                res += curcurve[1:]
+                prevtrail, trail = trail, lead - 1
+                window = points[trail:lead + 1]
+                curcurve = line3(window[0], window[1])
+            else: curcurve, maybeover = newcurve, False
+    if maybeover: # When it has reached the end...
+        newcurve = stress(points[prevtrail:lead + 1])[0]
+        res[-3:] = newcurve[1:]
+    else:
+        if not res: res += curcurve[:1]
+        res += curcurve[1:] # If it has reached the end, accept curcurve
+    return smooth(res, z)
+
+def smooth(res, z):
+    """Straightens nearly opposing handles at the nodes of res (in place, and returned), including the first node if the path is closed."""
+    ouro = res.pop() # Removes the final (redundant) node of closed paths. In the end, does not affect open paths.
+    for t in range(0, len(res), 3):
+        if t != 0 or z: # If not at beginning or if path is closed
+            v, w = res[t - 1] - res[t], res[t + 1] - res[t] # Previous and next handles
+            angle = dot(v, w) / abs(v) / abs(w)
+            if angle <= -0.94: # ~ cos(160 degrees)
+                # Rotate opposing handles and make a straight line.
+                theta = (pi - acos(max(angle, -1))) / 2 # Angle to rotate by
+                sign = 1 if (phase(v) > phase(w)) ^ (abs(phase(v) - phase(w)) >= pi) else -1 # Direction to rotate (WTF?)
+                res[t - 1] = res[t] + v * rect(1, sign * theta)
+                res[t + 1] = res[t] + w * rect(1, -sign * theta)
+    res.append(ouro)
+    return res
+
+def line3(a, b): return [a, linterp(a, b, 1 / 3), linterp(a, b, 2 / 3), b] # the straight cubic between two nodes
+
+# Takes a list of four nodes and generates a curve passing through all based on chords().
+# If lm and mu (the two params for the middle nodes) are not given they are calculated.
+def cubicfrom4(nodes, lm = None, mu = None):
+    if lm == None or mu == None: lm, mu = chords(nodes)[1:3] # lm is short for lambda
+    a = 3 * (1 - lm) * (1 - lm) * lm
+    b = 3 * (1 - lm) *      lm  * lm
+    c = 3 * (1 - mu) * (1 - mu) * mu
+    d = 3 * (1 - mu) *      mu  * mu
+    x = nodes[1] - (1 - lm) ** 3 * nodes[0] - lm ** 3 * nodes[3]
+    y = nodes[2] - (1 - mu) ** 3 * nodes[0] - mu ** 3 * nodes[3]
+    det = a * d - b * c
+    if not det: raise ValueError("singular matrix")
+    return [nodes[0], (d * x - b * y) / det, (a * y - c * x) / det, nodes[3]]
+
+# Stress theory: takes a list of five or more nodes and stresses a curve to fit
+def stress(string):
+    # Make an initial guess considering the end nodes together with the 2nd/2nd last, 3rd/3rd last, ... nodes.
+    # This is much faster than considering all sets of two interior nodes.
+    callipers, middle = chords(string), len(string) // 2
+    seeds = [cubicfrom4([string[0], string[i], string[-i - 1], string[-1]], callipers[i], callipers[-i - 1]) for i in range(1, middle)]
+    curve = [string[0], sum(s[1] for s in seeds) / len(seeds), sum(s[2] for s in seeds) / len(seeds), string[-1]]
+    # Refine by projection and handle shifting
+    for i in range(5):
+        for j in range(middle - 1, 0, -1):
+            b = bezier(*curve)
+            curve[1] += 2.5 * project(b, string[j])
+            curve[2] += 2.5 * project(b, string[-j - 1])
+    b = bezier(*curve)
+    return curve, [abs(project(b, k)) for k in string]
+
+# Offset of the node from its projection onto the bezier curve; kinback's projection solves the quintic exactly
+# instead of sampling the curve at 201 points and refining, as the original extension did.
+def project(curve, node): return node - curve(curve.projection(node))
+
+# Incremental least-squares fitting of windows. With chord parameters u_i = s_i / S (s_i the running chord length, S the window's length)
+# every sum in the normal equations of the cubic through the window's ends is a combination of the moments Σ s_i^k and Σ s_i^k x_i,
+# which only need one more term each when the window grows by a node; the new fit is then a 2×2 solve.
+bern = (Pol([1, -3, 3, -1]), Pol([0, 3, -6, 3]), Pol([0, 0, 3, -3]), Pol([0, 0, 0, 1]))
+bprod = {(i, j): list((bern[i] * bern[j]).a) for i in range(4) for j in range(1, 3)}
+class windowfit:
+    def __init__(self, start):
+        self.pts, self.s, self.shortest = [start], [0], float("inf")
+        self.m, self.n = [1] + [0] * 6, [start] + [0] * 3 # Σ s^k for k = 0..6 and Σ s^k x for k = 0..3
+    def __len__(self): return len(self.pts)
+    def extend(self, z):
+        """Adds the node z to the end of the window in constant time."""
+        step = abs(z - self.pts[-1])
+        s = self.s[-1] + step
+        self.pts.append(z)
+        self.s.append(s)
+        self.shortest = min(self.shortest, step)
+        pk = 1
+        for k in range(7):
+            self.m[k] += pk
+            if k < 4: self.n[k] += pk * z
+            pk *= s
+    def fit(self):
+        """The least-squares cubic (as a 4-list) through the window's end nodes at chord-length parameters."""
+        p0, p3, S, w = self.pts[0], self.pts[-1], self.s[-1], len(self.pts)
+        if w == 2 or not S: return line3(p0, p3)
+        if w == 3: # Quadratic curve on three nodes stepped to a cubic
+            t = self.s[1] / S
+            qc = (self.pts[1] - (1 - t) * (1 - t) * p0 - t * t * p3) / (2 * t * (1 - t))
+            return [p0, linterp(p0, qc, 2 / 3), linterp(qc, p3, 1 / 3), p3]
+        mu = [self.m[k] / S ** k for k in range(7)]
+        nu = [self.n[k] / S ** k for k in range(4)]
+        sm = lambda c: sum(a * b for a, b in zip(c, mu))
+        a11, a12, a22 = sm(bprod[1, 1]), sm(bprod[1, 2]), sm(bprod[2, 2])
+        x1, x2 = (sum(a * b for a, b in zip(bern[j].a, nu)) - sm(bprod[0, j]) * p0 - sm(bprod[3, j]) * p3 for j in (1, 2))
+        det = a11 * a22 - a12 * a12
+        if not det: return line3(p0, p3)
+        return [p0, (a22 * x1 - a12 * x2) / det, (a11 * x2 - a12 * x1) / det, p3]
+    def maxerror(self, q, bound = 0):
+        """Maximum distance of the window's nodes from the cubic q. Residuals at the chord parameters are upper bounds of the distances;
+        only those above bound are polished by a few Newton steps towards the true projection."""
+        S, worst = self.s[-1], 0
+        for s, x in zip(self.s, self.pts):
+            t = s / S
+            e = abs(cubicat(q, t) - x)
+            if e > bound:
+                for k in range(4):
+                    d, d1, d2 = cubicat(q, t) - x, cubicd(q, t), cubicdd(q, t)
+                    den = dot(d1, d1) + dot(d, d2)
+                    if not den: break
+                    t = min(max(t - dot(d, d1) / den, 0), 1)
+                e = min(e, abs(cubicat(q, t) - x))
+            worst = max(worst, e)
+        return worst
+
+def flevofit(points, z, bound = 0.33):
+    """Flevobézier's windowing with incremental least-squares fits: the window grows node by node until the next node turns by 60 degrees or more,
+    or some node strays more than bound times the window's shortest chord from the fit, whereupon the fit so far is accepted and a new window begins."""
+    if len(points) < 2: raise ValueError("a curve isn't a point, silly!")
+    res, win = [points[0]], windowfit(points[0])
+    win.extend(points[1])
+    curcurve = win.fit()
+    for lead in range(2, len(points)):
+        v, w = points[lead - 2] - points[lead - 1], points[lead] - points[lead - 1]
+        if dot(v, w) / abs(v) / abs(w) < 0.5:
+            win.extend(points[lead])
+            newcurve = win.fit()
+            if win.maxerror(newcurve, bound * win.shortest) <= bound * win.shortest:
+                curcurve = newcurve
+                continue
+        res += curcurve[1:] # over by angle or error
+        win = windowfit(points[lead - 1])
+        win.extend(points[lead])
+        curcurve = win.fit()
+    res += curcurve[1:]
+    return smooth(res, z)
+
+def refit(d, engine = flevobezier):
+    """Runs Flevobézier (or another engine with the same signature, like flevofit) on every subpath of the path data d,
+    taking the nodes (with repeats dropped) as the points to fit, and returns the new path data. Subpaths of a single distinct node are kept as they are."""
+    src, out = path(d), path("")
+    for sp, z in zip(src.segments, src.closed):
+        if not sp: continue
+        nodes = [sp[0](0)] + [seg(1) for seg in sp]
+        nodes = nodes[:1] + [b for a, b in zip(nodes, nodes[1:]) if a != b] # repeated nodes, common in traced input, make zero-length steps
+        if len(nodes) < 2:
+            out.segments.append(sp)
+            out.closed.append(z)
+            continue
+        res = engine(nodes, z)
+        out.segments.append([bezier(*res[i:i + 4]) for i in range(0, len(res) - 1, 3)])
+        out.closed.append(z)
+    return out.tosvg()
+
+if __name__ == "__main__":
+    import sys, argparse
+    cdl = argparse.ArgumentParser(prog="python3 -m kinback.flevo", description="Flevobézier outside Inkscape: refits the nodes of SVG path data with cubics")
+    cdl.add_argument("-i", "--incremental", action="store_true", default=False, help="use the incremental least-squares fitter instead of stress theory")
+    cdl.add_argument("paths", nargs="*", help="path data strings (if left blank, read one per line from standard input)")
+    flags = cdl.parse_args()
+    for d in flags.paths or (l.strip() for l in sys.stdin if l.strip()): print(refit(d, flevofit if flags.incremental else flevobezier))
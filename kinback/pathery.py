@@ -1,6 +1,7 @@
 # Helper functions for Kinross: paths
 # Parcly Taxel / Jeremy Tan, 2016
 # https://parclytaxel.tumblr.com
+from math import degrees, pi
 from cmath import isclose
 from .regexes import pcomm_re, num_re, fsmn, catn
 from .segment import bezier, ellipt
@@ -46,6 +47,66 @@ class path:
                     params = [pen] + params
                     self.segments[-1].append(ellipt.fromsvg_path(*params) if typ == "A" else bezier(*params))
                     pen = params[-1]
+    def __rmatmul__(self, m):
+        res = path("")
+        res.segments, res.closed = [[m @ s for s in sp] for sp in self.segments], self.closed[:]
+        return res
+    
+    def tosvg(self, D = 8):
+        """The shortest path data string for this path. Each command is written in absolute or relative coordinates, whichever is shorter,
+        and relative coordinates are taken from the rounded pen position so that errors do not accumulate. D is passed on to fsmn."""
+        out, last, pen = [], None, 0j
+        def emit(head, pts, extra = ()):
+            # pts are the command's points; returns the new (rounded) pen position
+            nonlocal last
+            res = []
+            for rel in (False, True):
+                o = pen if rel else 0
+                nums = [fsmn(x, D) for x in extra]
+                for p in pts: nums += [fsmn((p - o).real, D), fsmn((p - o).imag, D)]
+                if head in "HV": nums = nums[:1] if head == "H" else nums[1:]
+                res.append((len(catn(*nums)), rel, nums))
+            l, rel, nums = min(res, key=lambda r: (r[0], not r[1]))
+            h = head.lower() if rel else head
+            if h != last: out.append(h)
+            out.extend(nums)
+            last = {"M": "L", "m": "l"}.get(h, h)
+            if head == "H": return complex(float(nums[-1]) + (pen.real if rel else 0), pen.imag)
+            if head == "V": return complex(pen.real, float(nums[-1]) + (pen.imag if rel else 0))
+            return complex(float(nums[-2]), float(nums[-1])) + (pen if rel else 0)
+        for sp, z in zip(self.segments, self.closed):
+            if not sp: continue
+            segs = sp[:]
+            start = segs[0](0)
+            if z and len(segs) > 1 and type(segs[-1]) == bezier and segs[-1].deg == 1 and isclose(segs[-1](1), start, abs_tol=10 ** -D): segs.pop() # the closing line is implied by Z
+            last, prev = None, None
+            pen = mpen = emit("M", [start])
+            for seg in segs:
+                end = seg(1)
+                if type(seg) == ellipt:
+                    large, sweep = abs(seg.t1 - seg.t0) > pi, seg.t1 > seg.t0
+                    pen = emit("A", [end], (seg.r1, seg.r2, degrees(seg.th), large, sweep))
+                elif seg.deg == 1:
+                    d = end - pen
+                    if fsmn(d.imag, D) == "0": pen = emit("H", [end])
+                    elif fsmn(d.real, D) == "0": pen = emit("V", [end])
+                    else: pen = emit("L", [end])
+                else:
+                    refl = type(prev) == bezier and prev.deg == seg.deg and isclose(seg.p[1], 2 * prev.p[-1] - prev.p[-2], abs_tol=10 ** -D)
+                    if seg.deg == 2: pen = emit("T", [end]) if refl else emit("Q", seg.p[1:])
+                    else: pen = emit("S", seg.p[2:]) if refl else emit("C", seg.p[1:])
+                prev = seg
+            if z:
+                out.append("z")
+                pen, last = mpen, "z"
+        # Join the tokens, dropping every delimiter that is not needed
+        res, num, dp = "", False, True
+        for s in out:
+            if s.isalpha(): res, num = res + s, False
+            else:
+                res += s if not num or s[0] == '-' or s[0] == '.' and dp else ' ' + s
+                num, dp = True, '.' in s or 'e' in s
+        return res
 
 def parsepath(p):
     out = ""
@@ -0,0 +1,71 @@
+# Helper functions for Kinross: embedded raster data (large data URIs kept out of the node tree, recompression of PNGs)
+# Parcly Taxel / Jeremy Tan, 2016
+# https://parclytaxel.tumblr.com
+import re, zlib, struct, binascii
+from hashlib import sha1
+from base64 import b64decode, b64encode
+
+# Large data URIs are cut out of the source before parsing, each replaced by a short stand-in (itself a valid data URI, "data:,kinback-n"),
+# so that the tree only carries the stand-ins. The payloads are kept as memoryviews of the source, which may be a memory map; nothing of them
+# is copied, and splice() writes them back verbatim in place of their stand-ins. Identical payloads share a stand-in, so dedupdefs() can merge their images.
+datauri_re = re.compile(rb"data:[^\"'<>]*")
+standin_re = re.compile(r"data:,kinback-(\d+)")
+pngprefix = b"data:image/png;base64,"
+pngmagic = b"\x89PNG\r\n\x1a\n"
+b64junk_re = re.compile(rb"\s+|&#(?:10|13|x[aAdD]);") # line breaks inside the base64, raw or as character references
+
+def stow(buf, least = 1024):
+    """Cuts the data URIs of at least least bytes that are whole attribute values out of buf (bytes or a memory map).
+    Returns the rest of the document as bytes and the list of payloads, the nth of which is stood in for by "data:,kinback-n"."""
+    view, pieces, spans, seen, last = memoryview(buf), [], [], {}, 0
+    for m in datauri_re.finditer(buf):
+        s, e = m.span()
+        q = buf[s - 1:s]
+        if e - s < least or q not in (b'"', b"'") or buf[e:e + 1] != q: continue
+        payload = view[s:e]
+        n = seen.setdefault(sha1(payload).digest(), len(spans))
+        if n == len(spans): spans.append(payload)
+        pieces += [view[last:s], "data:,kinback-{}".format(n).encode()]
+        last = e
+    pieces.append(view[last:])
+    return b"".join(pieces), spans
+def splice(outf, text, spans):
+    """Writes text (a serialised tree with stand-ins from stow) to the binary file outf as UTF-8, with the payloads back in place."""
+    for i, s in enumerate(standin_re.split(text)):
+        outf.write(spans[int(s)] if i % 2 else s.encode())
+
+def repng(data, level = 9):
+    """Recompresses the image data of the PNG data (bytes) at the given zlib level, trying the default and filtered strategies, into a single IDAT chunk.
+    Other chunks are kept as they are. Returns the smallest of the results and data itself."""
+    if data[:8] != pngmagic: return data
+    chunks, idat, pos = [], [], 8
+    while pos + 12 <= len(data):
+        n, kind = struct.unpack(">I4s", data[pos:pos + 8])
+        if kind == b"IDAT":
+            if not idat: chunks.append(None) # where the new IDAT goes
+            idat.append(data[pos + 8:pos + 8 + n])
+        else: chunks.append(data[pos:pos + n + 12])
+        pos += n + 12
+    try: raw = zlib.decompress(b"".join(idat))
+    except zlib.error: return data
+    best = None
+    for strategy in (zlib.Z_DEFAULT_STRATEGY, zlib.Z_FILTERED):
+        c = zlib.compressobj(level, zlib.DEFLATED, 15, 9, strategy)
+        z = c.compress(raw) + c.flush()
+        if best == None or len(z) < len(best): best = z
+    idatchunk = struct.pack(">I", len(best)) + b"IDAT" + best + struct.pack(">I", zlib.crc32(best, zlib.crc32(b"IDAT")))
+    res = pngmagic + b"".join(idatchunk if c == None else c for c in chunks)
+    return res if len(res) < len(data) else data
+def recompress(spans, level = 9):
+    """Replaces the payloads among spans that are base64 PNGs by their recompressions under repng(), where that makes them shorter.
+    Returns the number of PNGs so shrunk and the bytes saved."""
+    N, saved = 0, 0
+    for i, p in enumerate(spans):
+        if p[:len(pngprefix)] != pngprefix: continue
+        try: data = b64decode(b64junk_re.sub(b"", p[len(pngprefix):]), validate=True)
+        except binascii.Error: continue
+        new = pngprefix + b64encode(repng(data, level))
+        if len(new) < len(p):
+            N, saved = N + 1, saved + len(p) - len(new)
+            spans[i] = new
+    return N, saved
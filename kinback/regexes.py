@@ -8,6 +8,8 @@ semicolons = re.compile(r"[^;]+")
 tf_re = re.compile(r"(matrix|translate|scale|rotate|skewX|skewY)\s*\((.*?)\)")
 num_re = re.compile(r"[-+]?(?:(?:[0-9]*\.[0-9]+)|(?:[0-9]+\.?))(?:[eE][-+]?[0-9]+)?")
 pcomm_re = re.compile("([MZLHVCSQTAmzlhvcsqta])([^MZLHVCSQTAmzlhvcsqta]*)")
+word_re = re.compile(r"[\w-]+") # words of scripts and stylesheets that may name IDs
+url_re = re.compile(r"url\(#([^)]*)\)")
 
 from math import log10, floor
 def fsmn(x, D = 8):
@@ -0,0 +1,201 @@
+# Helper functions for Kinross: regions enclosed by paths (containment and random points inside them)
+# Parcly Taxel / Jeremy Tan, 2016
+# https://parclytaxel.tumblr.com
+from math import sqrt, acos, ceil, floor, atan2, cos, sin, pi
+try: import numpy as np
+except ImportError: np = None
+from .segment import bezier, ellipt
+from .discord import rng, bridsonrounds
+
+def flatten(p, tol):
+    """The subpaths of the path p as polylines (lists of complex numbers), each segment cut into enough chords to stay within tol of it.
+    Chord counts for Bézier curves follow Wang's formula; arcs are cut into equal angles."""
+    res = []
+    for sp in p.segments:
+        if not sp: continue
+        poly = [sp[0](0)]
+        for seg in sp:
+            if type(seg) == ellipt:
+                R = max(abs(seg.r1), abs(seg.r2))
+                n = ceil(abs(seg.t1 - seg.t0) / (2 * acos(1 - tol / R))) if R > tol else 1
+            else:
+                q, d = seg.p, seg.deg
+                m = max((abs(q[i] - 2 * q[i + 1] + q[i + 2]) for i in range(d - 1)), default=0)
+                n = ceil(sqrt(d * (d - 1) / 8 * m / tol)) if m else 1
+            poly += [seg(i / n) for i in range(1, n + 1)]
+        res.append(poly)
+    return res
+def hull(p):
+    """Opposite corners of a box containing the path p, from its control points and arc centres and radii."""
+    pts = []
+    for sp in p.segments:
+        for seg in sp:
+            if type(seg) == ellipt:
+                R = max(abs(seg.r1), abs(seg.r2))
+                pts += [seg.c - complex(R, R), seg.c + complex(R, R)]
+            else: pts += seg.p
+    return complex(min(z.real for z in pts), min(z.imag for z in pts)), complex(max(z.real for z in pts), max(z.imag for z in pts))
+
+# The winding-number engine. Every segment is cut where dx/dt or dy/dt vanishes (at the real roots of pdx and pdy for Bézier curves,
+# at atan2(-r2 sin th, r1 cos th) + kπ and atan2(r2 cos th, r1 sin th) + kπ for arcs) into pieces monotone in both coordinates, so that a horizontal line
+# meets each piece at most once and the ends of any stretch of a piece bound it. Both kinds of piece are written as c0 + c1 s + c2 s² + c3 s³ + A cos s + B sin s
+# in each coordinate (s the curve's own parameter or the arc's angle). With the pieces bucketed by rows, a rightward ray from a query point is tested
+# only against the pieces in its row and spanning its y, and only those whose x-range contains the point need the crossing found, by a bisection
+# that stops as soon as the stretch left is wholly on one side of the point.
+class winding:
+    def __init__(self, p, rows = None):
+        """Prepares the pieces of the path p (subpaths implicitly closed); rows is the number of buckets, by default the number of pieces."""
+        if np == None: raise ImportError("the winding-number engine requires NumPy")
+        cf, rng_ = [], [] # coefficient rows (x then y) and parameter ranges
+        def addpieces(xc, yc, cuts, s0, s1):
+            lo, hi = min(s0, s1), max(s0, s1)
+            cuts = sorted({s0, s1} | {c for c in cuts if lo < c < hi}, reverse=s0 > s1)
+            for a, b in zip(cuts, cuts[1:]):
+                cf.append(xc + yc)
+                rng_.append((a, b))
+        for sp, z in zip(p.segments, p.closed):
+            if not sp: continue
+            segs = sp + ([bezier(sp[-1](1), sp[0](0))] if sp[-1](1) != sp[0](0) else [])
+            for seg in segs:
+                if type(seg) == ellipt:
+                    c, r1, r2, th = seg.c, seg.r1, seg.r2, seg.th
+                    ty, tx = atan2(r2 * cos(th), r1 * sin(th)), atan2(-r2 * sin(th), r1 * cos(th))
+                    k0, k1 = floor(min(seg.t0, seg.t1) / pi) - 1, ceil(max(seg.t0, seg.t1) / pi) + 1
+                    addpieces([c.real, 0, 0, 0, r1 * cos(th), -r2 * sin(th)], [c.imag, 0, 0, 0, r1 * sin(th), r2 * cos(th)],
+                              [t + k * pi for t in (tx, ty) for k in range(k0, k1)], seg.t0, seg.t1)
+                else:
+                    pad = lambda q: (list(q.a) + [0] * 4)[:4] + [0, 0]
+                    addpieces(pad(seg.px), pad(seg.py), seg.pdx.reals() + seg.pdy.reals(), 0, 1)
+        if not cf: raise ValueError("the path encloses nothing")
+        self.cx, self.cy = np.array([c[:6] for c in cf]), np.array([c[6:] for c in cf])
+        self.sa, self.sb = np.array([r[0] for r in rng_]), np.array([r[1] for r in rng_])
+        self.trig = bool(np.any(self.cx[:, 4:]) or np.any(self.cy[:, 4:]))
+        self.ya, self.yb = self.at(self.cy, self.sa), self.at(self.cy, self.sb)
+        self.xa, self.xb = self.at(self.cx, self.sa), self.at(self.cx, self.sb)
+        self.xlo, self.xhi = np.minimum(self.xa, self.xb), np.maximum(self.xa, self.xb)
+        self.dirn = np.where(self.yb > self.ya, 1, -1)
+        ylo, yhi = np.minimum(self.ya, self.yb), np.maximum(self.ya, self.yb)
+        self.Y0, self.Y1 = ylo.min(), yhi.max()
+        self.rows = rows or len(cf)
+        self.rh = max(self.Y1 - self.Y0, 1e-9) / self.rows
+        r0, r1 = self.rowof(ylo), self.rowof(yhi)
+        lens = r1 - r0 + 1
+        rws = np.repeat(r0, lens) + np.arange(lens.sum()) - np.repeat(np.cumsum(lens) - lens, lens)
+        order = np.argsort(rws, kind="stable")
+        self.bucket, self.start = np.repeat(np.arange(lens.size), lens)[order], np.searchsorted(rws[order], np.arange(self.rows + 1))
+    def rowof(self, y): return np.clip(np.floor((y - self.Y0) / self.rh).astype(np.int64), 0, self.rows - 1)
+    def at(self, c, s):
+        """Values of the pieces with coefficient rows c at the parameters s."""
+        res = c[:, 0] + s * (c[:, 1] + s * (c[:, 2] + s * c[:, 3]))
+        return res + c[:, 4] * np.cos(s) + c[:, 5] * np.sin(s) if self.trig else res
+
+    def __call__(self, x, y):
+        """Winding numbers of the path around the points (coordinate arrays)."""
+        x, y = np.asarray(x, float).ravel(), np.asarray(y, float).ravel()
+        i = np.flatnonzero((y >= self.Y0) & (y <= self.Y1))
+        iy = self.rowof(y[i])
+        n = self.start[iy + 1] - self.start[iy]
+        pt = np.repeat(i, n)
+        pc = self.bucket[np.repeat(self.start[iy], n) + np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)]
+        yy = y[pt]
+        cross = np.flatnonzero((self.ya[pc] <= yy) != (self.yb[pc] <= yy))
+        pt, pc, yy = pt[cross], pc[cross], yy[cross]
+        xx = x[pt]
+        right = xx < self.xlo[pc]
+        amb = np.flatnonzero(~right & (xx < self.xhi[pc]))
+        q = pc[amb]
+        lanes = [amb, self.cx[q], self.cy[q], self.sa[q], self.sb[q], self.xa[q], self.xb[q], self.dirn[q], yy[amb], xx[amb]]
+        for k in range(54): # down to the last bit of the parameter at most
+            if not lanes[0].size: break
+            j, cx, cy, lo, hi, xl, xh, sg, yt, xt = lanes
+            mid = (lo + hi) / 2
+            xm, up = self.at(cx, mid), (self.at(cy, mid) - yt) * sg > 0
+            lo, hi, xl, xh = np.where(up, lo, mid), np.where(up, mid, hi), np.where(up, xl, xm), np.where(up, xm, xh)
+            done = ((xl > xt) == (xh > xt)) | (k == 53)
+            right[j[done]] = xl[done] + xh[done] > 2 * xt[done]
+            lanes = [a[~done] for a in (j, cx, cy, lo, hi, xl, xh, sg, yt, xt)]
+        return np.bincount(pt[right], self.dirn[pc[right]], x.size).astype(np.int64)
+    def contains(self, x, y, evenodd = False):
+        """Whether each of the points (coordinate arrays) is inside the path under the nonzero fill rule, or the evenodd one."""
+        w = self(x, y)
+        return (w & 1 if evenodd else w).astype(bool)
+
+# A path's interior (filled by the nonzero rule or the evenodd one, subpaths implicitly closed) is rasterised once into a coverage grid
+# whose cells are wholly outside (0), wholly inside (1) or crossed by the outline (2), the last found by walking the flattened outline.
+# Random points are drawn in a random non-outside cell, and only those in crossed cells need the exact test of the winding engine;
+# when crossed cells are a minority of the candidates, as they are on a fine enough grid, this is O(1) per point.
+class pathregion:
+    def __init__(self, p, evenodd = False, cells = 256, tol = None):
+        """Rasterises the path p onto a grid of cells squares along its longer side; tol (by default a sixteenth of a cell) is the flattening tolerance
+        used to find the crossed cells, which are widened to make up for it."""
+        if np == None: raise ImportError("path regions require NumPy")
+        lo, hi = hull(p)
+        if tol == None: tol = max(hi.real - lo.real, hi.imag - lo.imag, 1e-9) / cells / 16
+        polys = [np.array(q) for q in flatten(p, tol)]
+        if not polys: raise ValueError("the path encloses nothing")
+        a, b = np.concatenate(polys), np.concatenate([np.roll(q, -1) for q in polys])
+        self.engine, self.evenodd, self.X, self.Y = winding(p), evenodd, a.real.min() - tol, a.imag.min() - tol
+        self.cs = max(a.real.max() + tol - self.X, a.imag.max() + tol - self.Y) / cells
+        self.nx, self.ny = max(1, ceil((a.real.max() + tol - self.X) / self.cs)), max(1, ceil((a.imag.max() + tol - self.Y) / self.cs))
+        # Cells near the outline: each edge is walked in steps of half a cell, and each step marks the cells of its bounding box widened by tol
+        m = np.maximum(np.ceil(np.abs(b - a) / self.cs * 2).astype(np.int64), 1)
+        k = np.repeat(np.arange(m.size), m)
+        j = np.arange(m.sum()) - np.repeat(np.cumsum(m) - m, m)
+        p0, p1 = a[k] + (b - a)[k] * (j / m[k]), a[k] + (b - a)[k] * ((j + 1) / m[k])
+        xs = (self.colof(np.minimum(p0.real, p1.real) - tol), self.colof(np.maximum(p0.real, p1.real) + tol))
+        ys = (self.rowof(np.minimum(p0.imag, p1.imag) - tol), self.rowof(np.maximum(p0.imag, p1.imag) + tol))
+        self.status = np.zeros(self.nx * self.ny, np.int8)
+        for cx in xs:
+            for cy in ys: self.status[cy * self.nx + cx] = 2
+        free = np.flatnonzero(self.status == 0)
+        self.status[free] = self.exact(self.X + (free % self.nx + 0.5) * self.cs, self.Y + (free // self.nx + 0.5) * self.cs)
+        self.cand = np.flatnonzero(self.status)
+        if not self.cand.size: raise ValueError("the path encloses nothing")
+        self.fill = (np.count_nonzero(self.status == 1) + 0.5 * np.count_nonzero(self.status == 2)) / self.cand.size # rough acceptance rate
+    def rowof(self, y): return np.clip(np.floor((y - self.Y) / self.cs).astype(np.int64), 0, self.ny - 1)
+    def colof(self, x): return np.clip(np.floor((x - self.X) / self.cs).astype(np.int64), 0, self.nx - 1)
+
+    def exact(self, x, y):
+        """Containment of the points (coordinate arrays) by the path itself, whatever cells they are in."""
+        return self.engine.contains(x, y, self.evenodd)
+    def contains(self, x, y):
+        """Whether each of the points (coordinate arrays) is in the region."""
+        x, y = np.asarray(x, float), np.asarray(y, float)
+        res = (x >= self.X) & (x < self.X + self.nx * self.cs) & (y >= self.Y) & (y < self.Y + self.ny * self.cs)
+        i = np.flatnonzero(res)
+        st = self.status[self.rowof(y[i]) * self.nx + self.colof(x[i])]
+        res[i] = st == 1
+        b = i[st == 2]
+        res[b] = self.exact(x[b], y[b])
+        return res
+
+    def points(self, n, g = None):
+        """n points drawn uniformly from the region as a complex array, using the NumPy Generator g (by default that of kinback.discord's rng)."""
+        if g == None: g = rng.npgen()
+        res, got = [], 0
+        while got < n:
+            m = int((n - got) / self.fill) + 16
+            c = self.cand[g.integers(self.cand.size, size=m)]
+            x, y = self.X + (c % self.nx + g.random(m)) * self.cs, self.Y + (c // self.nx + g.random(m)) * self.cs
+            ok = self.status[c] == 1
+            b = np.flatnonzero(~ok)
+            ok[b] = self.exact(x[b], y[b])
+            res.append(x[ok] + 1j * y[ok])
+            got += res[-1].size
+        return np.concatenate(res)[:n]
+    def pointpick(self):
+        """Picks a point in the region."""
+        return complex(self.points(1)[0])
+    def bridsondisc(self, r = 1, max_points = None, k = 32):
+        """Poisson-samples the region with all distances between points at least r, as kinback.discord.bridsondisc does for rectangles.
+        Every separate part of the region is filled."""
+        g, n = rng.npgen(), 0
+        def seeder(m):
+            z = self.points(m, g)
+            return z.real - self.X, z.imag - self.Y
+        within = lambda x, y: self.contains(x + self.X, y + self.Y)
+        for x, y in bridsonrounds(g, self.nx * self.cs, self.ny * self.cs, r, k, within=within, seeder=seeder):
+            for x, y in zip(x.tolist(), y.tolist()):
+                yield complex(x + self.X, y + self.Y)
+                n += 1
+                if n == max_points: return
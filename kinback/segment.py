@@ -1,10 +1,10 @@
 # Helper functions for Kinross: Bézier curve and elliptical arc segments (includes whole ellipses!)
 # Parcly Taxel / Jeremy Tan, 2016
 # https://parclytaxel.tumblr.com
-from math import sqrt, sin, cos, tan, atan, pi, hypot, radians, degrees, floor, ceil
+from math import sqrt, sin, cos, tan, acos, atan, pi, hypot, radians, degrees, floor, ceil
 from cmath import rect, polar, phase, isclose
 from .affines import tf
-from .algebra import collinear, linterp, rombergquad, Pol
+from .algebra import collinear, linterp, rombergquad, pointbounds, Pol
 from .regexes import fsmn
 T, H = pi * 2, pi / 2
 
@@ -148,7 +148,7 @@ class bezier:
     
     def bounds(self): # orthogonal bounding box, represented as two opposite points
         if self.deg == 1: return pointbounds(self.p)
-        xb, yb = ([self(t) for t in z.reals() if 0 < t < 1] for z in (self.dpx, self.dpy))
+        xb, yb = ([self(t) for t in z.reals() if 0 < t < 1] for z in (self.pdx, self.pdy))
         return pointbounds(xb + yb + [self(0), self(1)])
     
     def kind(self):
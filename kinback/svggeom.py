@@ -0,0 +1,529 @@
+# Helper functions for Kinross: geometry of SVG nodes (transform baking and other passes that need to know where things are)
+# Parcly Taxel / Jeremy Tan, 2016
+# https://parclytaxel.tumblr.com
+from math import sqrt, log10, ceil, pi, copysign
+from cmath import isclose, phase
+from .affines import tf
+from .pathery import path
+from .fitting import simplify, nodecount
+from .segment import ellipt, bezier
+from .algebra import pointbounds, cross
+from .regexes import fsmn, catn, num_re
+from .colours import col2repr
+from .svgproc import _svg, _ink, _sod, obtainstyle, expungestyle, distributestyle, refsof, ellipsecollapse, allstyle
+
+ident = tf(1, 0, 0, 1, 0, 0)
+def isident(m): return not m.tosvg()
+def nodetf(node): return tf.fromsvg(node.get("transform", ""))
+def settf(node, m):
+    """Sets the transform attribute of node to the shortest form of m, removing it if m is the identity."""
+    s = m.tosvg()
+    if s: node.set("transform", s)
+    else: node.attrib.pop("transform", 0)
+
+containers = {_svg + "g", _svg + "a"}
+shapes = {_svg + s for s in ("path", "circle", "ellipse", "rect", "line", "polyline", "polygon")}
+nonrendering = {_svg + "title", _svg + "desc", _svg + "metadata"}
+carriers = containers | shapes | {_svg + s for s in ("use", "image", "text", "switch", "foreignObject")} # what can take a transform attribute (not nested <svg>s or definitions)
+# Style properties that affect baking and are inherited down the tree
+bakeinherit = ("fill", "stroke", "stroke-width", "stroke-dasharray", "stroke-dashoffset", "marker", "marker-start", "marker-mid", "marker-end")
+
+def inheritstyle(node, sty):
+    """The inherited style dictionary sty updated with the baking-relevant properties of node."""
+    res, own = dict(sty), obtainstyle(node)
+    for p in bakeinherit:
+        if p in own: res[p] = own[p]
+    if own.get("vector-effect", "none") != "none": res["vector-effect"] = own["vector-effect"]
+    else: res.pop("vector-effect", 0)
+    return res
+def strokescale(sty, s):
+    """The style properties to set on a node with (inherited) style sty so that its stroke looks the same after scaling its geometry by s;
+    None if this cannot be done (units, markers, non-scaling strokes)."""
+    if sty.get("stroke", "none") == "none" or isclose(s, 1): return {}
+    if any(sty.get(m, "none") != "none" for m in ("marker", "marker-start", "marker-mid", "marker-end")) or "vector-effect" in sty: return None
+    try:
+        res = {"stroke-width": fsmn(float(sty.get("stroke-width", "1")) * s)}
+        dash = sty.get("stroke-dasharray", "none")
+        if dash != "none": res["stroke-dasharray"] = ",".join(fsmn(float(n) * s) for n in dash.replace(",", " ").split())
+        if "stroke-dashoffset" in sty: res["stroke-dashoffset"] = fsmn(float(sty["stroke-dashoffset"]) * s)
+    except ValueError: return None
+    return res
+
+def absorbs(node, m, sty):
+    """Whether the shape node, with inherited style sty, can take the matrix m into its geometry and lose its transform entirely."""
+    if node.tag not in shapes or refsof(node) or any(sty.get(p, "").startswith('u') for p in ("fill", "stroke")): return False
+    if node.get(_sod + "type") != None or node.get(_ink + "original-d") != None: return False # editable Inkscape shapes and LPE paths
+    a, b, c, d = m.v[:4]
+    if sty.get("stroke", "none") != "none":
+        if not m.isconformal() or strokescale(sty, sqrt(abs(a * d - b * c))) == None: return False
+    try:
+        if node.tag == _svg + "rect":
+            [float(node.get(p, "0")) for p in ("x", "y", "width", "height", "rx", "ry")]
+            return isclose(b, 0, abs_tol=1e-12) and isclose(c, 0, abs_tol=1e-12) or isclose(a, 0, abs_tol=1e-12) and isclose(d, 0, abs_tol=1e-12)
+        if node.tag in (_svg + "circle", _svg + "ellipse"):
+            e = ellipt.fromsvg_node(node)[0]
+            return "transform" not in (m @ e).tosvg_node()[1]
+    except (ValueError, KeyError): return False
+    return True
+def absorbsdeep(node, m, sty):
+    """absorbs() extended to containers, which absorb when all their children do."""
+    if node.tag in containers:
+        if refsof(node): return False
+        sty = inheritstyle(node, sty)
+        return all(absorbsdeep(k, m @ nodetf(k), sty) for k in node if k.tag not in nonrendering)
+    return absorbs(node, m, sty)
+
+def applytf(node, m, sty):
+    """Bakes m into the geometry of the shape node, which must pass absorbs(), and removes its transform."""
+    a, b, c, d = m.v[:4]
+    ss = strokescale(sty, sqrt(abs(a * d - b * c)))
+    if ss:
+        sd = expungestyle(node)
+        sd.update(ss)
+        distributestyle(node, sd)
+    node.attrib.pop("transform", 0)
+    tag, g = node.tag[len(_svg):], node.get
+    if tag == "path": node.set("d", (m @ path(g("d", ""))).tosvg())
+    elif tag in ("circle", "ellipse"):
+        settf(node, m)
+        ellipsecollapse(node, True)
+    elif tag == "rect":
+        x, y, w, h = (float(g(p, "0")) for p in ("x", "y", "width", "height"))
+        rx, ry = g("rx"), g("ry")
+        p0, p1 = m @ complex(x, y), m @ complex(x + w, y + h)
+        for p, v in zip(("x", "y", "width", "height"), (min(p0.real, p1.real), min(p0.imag, p1.imag), abs(p1.real - p0.real), abs(p1.imag - p0.imag))):
+            node.set(p, fsmn(v))
+        if rx != None or ry != None:
+            rx, ry = float(rx if rx != None else ry), float(ry if ry != None else rx)
+            if isclose(b, 0, abs_tol=1e-12): rx, ry = rx * abs(a), ry * abs(d)
+            else: rx, ry = ry * abs(c), rx * abs(b)
+            rx, ry = fsmn(rx), fsmn(ry)
+            node.set("rx", rx)
+            if ry != rx: node.set("ry", ry)
+            else: node.attrib.pop("ry", 0)
+        rm_zero(node, ("x", "y"))
+    elif tag == "line":
+        p0, p1 = m @ complex(float(g("x1", "0")), float(g("y1", "0"))), m @ complex(float(g("x2", "0")), float(g("y2", "0")))
+        for p, v in zip(("x1", "y1", "x2", "y2"), (p0.real, p0.imag, p1.real, p1.imag)): node.set(p, fsmn(v))
+        rm_zero(node, ("x1", "y1", "x2", "y2"))
+    else: # polyline, polygon
+        nums = [float(n) for n in num_re.findall(g("points", ""))]
+        pts = [m @ complex(nums[i], nums[i + 1]) for i in range(0, len(nums) - 1, 2)]
+        node.set("points", catn(*(fsmn(x) for p in pts for x in (p.real, p.imag))))
+def rm_zero(node, attrs):
+    for p in attrs:
+        if node.get(p) == "0": del node.attrib[p]
+
+def bake(rn):
+    """Composes transforms down the tree from rn and bakes them into paths, circles, ellipses, axis-aligned rectangles, lines and polylines.
+    A group's transform is pushed to its children when all but at most one of them can absorb it and that one can carry a transform; a transform is left in place where
+    baking would distort a stroke, change what a <use> or paint server sees or break an Inkscape-editable shape. Returns the number of transforms eliminated."""
+    refd = set()
+    for k in rn.iter(): refd |= set(refsof(k).values())
+    pinned = set() # referenced nodes and their ancestors, which must never receive a transform from further up
+    def pin(node):
+        res = node.get("id") in refd
+        for k in node: res = pin(k) or res
+        if res: pinned.add(node)
+        return res
+    pin(rn)
+    def walk(node, a, sty):
+        m, sty = a @ nodetf(node), inheritstyle(node, sty)
+        if node.tag in containers:
+            push = not refsof(node) and not any(k in pinned for k in node)
+            if push and not isident(m):
+                stuck = [k for k in node if k.tag not in nonrendering and not absorbsdeep(k, m @ nodetf(k), sty)]
+                push = len(stuck) <= 1 and all(k.tag in carriers for k in stuck)
+            if push: node.attrib.pop("transform", 0)
+            else: settf(node, m)
+            for k in node:
+                if k.tag not in nonrendering: walk(k, m if push else ident, sty)
+        elif isident(m): node.attrib.pop("transform", 0)
+        elif absorbs(node, m, sty): applytf(node, m, sty)
+        else: settf(node, m)
+    before = sum(1 for k in rn.iter() if k.get("transform") != None)
+    sty = inheritstyle(rn, {})
+    for k in rn:
+        if k.tag in containers or k.tag in shapes: walk(k, ident, sty)
+    return before - sum(1 for k in rn.iter() if k.get("transform") != None)
+
+def simplifynode(node, tol):
+    """Simplifies the path data of the path node in place to within tol (see simplify) of the original in its own user space.
+    Returns the node counts before and after, or None if the node was left alone (Inkscape shapes, LPE paths, markers)."""
+    if node.tag != _svg + "path" or node.get(_sod + "type") != None or node.get(_ink + "original-d") != None or "d" not in node.attrib: return None
+    sd = obtainstyle(node)
+    if any(sd.get(m, "none") != "none" for m in ("marker", "marker-start", "marker-mid", "marker-end")): return None
+    p = path(node.get("d"))
+    q = simplify(p, tol)
+    before, after = nodecount(p), nodecount(q)
+    if after < before: node.set("d", q.tosvg())
+    return before, min(before, after)
+
+# Precision control. Every coordinate is rounded to the fewest decimal places that keep what it defines within eps device units of where it was:
+# walking down the tree, an upper bound of how much each node's user space is stretched on its way to the device (the product of the stretches
+# of the transforms above it) turns a budget in device units into a tolerance in the node's own units, and D places move a point by at most
+# 10 ** -D / sqrt(2). Errors add up down the tree, so each transform takes half the budget left by those above it for its translation
+# (of which a rotation centre's rounding can move twice as much) and leaves the other half to what lies below; nodes used elsewhere take
+# the largest stretch and the smallest budget among their users. Coordinates that add up (a rectangle's corner and size, a circle's centre
+# and radius) get half the tolerance each. Markers and patterns are left alone.
+units = {"": 1, "px": 1, "pt": 4 / 3, "pc": 16, "mm": 96 / 25.4, "cm": 96 / 2.54, "in": 96}
+def rootscale(rn):
+    """Device units per user unit of the root, from its width, height and viewBox; 1 where these are missing or relative."""
+    try:
+        vb = [float(n) for n in num_re.findall(rn.get("viewBox", ""))]
+        sw, sh = (svglength(rn.get(p, "")) for p in ("width", "height"))
+        return max(sw / vb[2], sh / vb[3])
+    except (AttributeError, KeyError, IndexError, ValueError, ZeroDivisionError): return 1
+def stretch(m):
+    """The largest factor by which the affine m stretches lengths."""
+    a, b, c, d = m.v[:4]
+    p, q = (a * a + b * b + c * c + d * d) / 2, abs(a * d - b * c)
+    return sqrt(p + sqrt(max(p * p - q * q, 0)))
+def places(tol): return max(ceil(-log10(tol * sqrt(2))), 0)
+def pathdeviation(p, q):
+    """An upper bound of the distance between corresponding points of the paths p and q, which share their structure
+    (q being p written out and read back, perhaps without closing lines)."""
+    res = 0
+    for sp, sq in zip(p.segments, q.segments):
+        for a, b in zip(sp, sq):
+            if type(a) == bezier and type(b) == bezier and a.deg == b.deg: res = max(res, max(abs(x - y) for x, y in zip(a.p, b.p)))
+            else: res = max(res, max(abs(a(t / 8) - b(t / 8)) for t in range(9)))
+    return res
+def roundattrs(node, attrs, D):
+    """Rounds the given attributes of node to D places, returning the changes (0 for absent attributes)."""
+    res = {}
+    for a in attrs:
+        v = node.get(a)
+        res[a] = 0
+        if v != None and num_re.fullmatch(v.strip()):
+            node.set(a, fsmn(float(v), D))
+            res[a] = float(node.get(a)) - float(v)
+    return res
+def roundgeometry(rn, eps):
+    """Rounds the path data, transforms, circles, ellipses, rectangles, lines, polylines and user-space gradient coordinates of rn
+    so that nothing moves by more than eps device units; stop offsets are rounded to three places. Returns an upper bound of the largest
+    movement actually incurred, the movements of the transforms above each node included (and those its users' transforms may incur)."""
+    users = {}
+    def survey(node, sc, rem):
+        if node.get("id") in users: sc, rem = max(sc, users[node.get("id")][0]), min(rem, users[node.get("id")][1])
+        if node.get("transform") != None: rem /= 2
+        sc *= stretch(nodetf(node))
+        for i in refsof(node).values():
+            u = users.get(i, (0, eps))
+            users[i] = (max(u[0], sc), min(u[1], rem))
+        for k in node: survey(k, sc, rem)
+    top = rootscale(rn)
+    for q in range(8): # every round carries the users' bounds one more reference along
+        last = dict(users)
+        survey(rn, top, eps)
+        if users == last: break
+    worst = 0
+    def walk(node, sc, rem, spent):
+        # sc is the stretch to the device, rem the budget left and spent the movement the transforms above have incurred, in device units
+        nonlocal worst
+        tag, own, dev = node.tag[len(_svg):], nodetf(node), 0
+        if tag in ("marker", "pattern"): return
+        if node.get("id") in users:
+            usc, urem = users[node.get("id")]
+            sc, rem, spent = max(sc, usc), min(rem, urem), max(spent, eps - urem)
+        if node.get("transform") != None:
+            rem /= 2
+            new = tf.fromsvg(own.tosvg(places(rem / 2 / sc)))
+            spent += sc * abs(complex(*new.v[4:]) - complex(*own.v[4:]))
+            settf(node, new)
+            own = new
+        sc *= stretch(own)
+        tol = rem / sc
+        if tag == "path" and node.get("d") != None:
+            p = path(node.get("d"))
+            node.set("d", p.tosvg(places(tol)))
+            dev = pathdeviation(p, path(node.get("d")))
+        elif tag in ("circle", "ellipse"):
+            d = roundattrs(node, ("cx", "cy", "r", "rx", "ry"), places(tol / 2))
+            dev = abs(complex(d["cx"], d["cy"])) + max(abs(d["r"]), abs(d["rx"]), abs(d["ry"]))
+        elif tag == "rect":
+            d = roundattrs(node, ("x", "y", "width", "height", "rx", "ry"), places(tol / 2))
+            dev = max(abs(complex(d["x"], d["y"])), abs(complex(d["x"] + d["width"], d["y"] + d["height"]))) + max(abs(d["rx"]), abs(d["ry"]))
+        elif tag == "line":
+            d = roundattrs(node, ("x1", "y1", "x2", "y2"), places(tol))
+            dev = max(abs(complex(d["x1"], d["y1"])), abs(complex(d["x2"], d["y2"])))
+        elif tag in ("polyline", "polygon"):
+            D, nums = places(tol), [float(n) for n in num_re.findall(node.get("points", ""))]
+            new = [fsmn(x, D) for x in nums]
+            node.set("points", catn(*new))
+            dev = max((abs(complex(float(new[i]) - nums[i], float(new[i + 1]) - nums[i + 1])) for i in range(0, len(nums) - 1, 2)), default=0)
+        elif tag == "stop": roundattrs(node, ("offset",), 3)
+        elif tag in ("linearGradient", "radialGradient") and node.get("id") in users and node.get("gradientUnits") == "userSpaceOnUse":
+            sg = users[node.get("id")][0] * stretch(tf.fromsvg(node.get("gradientTransform", "")))
+            d = roundattrs(node, ("x1", "y1", "x2", "y2", "cx", "cy", "fx", "fy", "r", "fr"), places(rem / sg / 2))
+            worst = max(worst, spent + sg * max(abs(complex(d["x1"], d["y1"])), abs(complex(d["x2"], d["y2"])),
+                                                abs(complex(d["cx"], d["cy"])) + abs(d["r"]), abs(complex(d["fx"], d["fy"])) + abs(d["fr"])))
+        worst = max(worst, spent + dev * sc)
+        for k in node: walk(k, sc, rem, spent)
+    walk(rn, top, eps, 0)
+    return worst
+
+# Merging of runs of sibling paths. Consecutive <path>s carrying nothing but path data and the same style are joined into compound paths
+# as long as their bounding boxes, grown by the reach of the stroke, do not meet: shapes that do not overlap look the same painted together
+# as one after another, whatever the fill rule, opacities and paint order. Paths with markers, dashes, paint servers or other references,
+# non-scaling strokes or attributes besides d and style properties are left alone.
+def pathbounds(p):
+    """Opposite corners of the bounding box of the path p (arcs are bounded by their whole ellipses)."""
+    pts = []
+    for sp in p.segments:
+        for seg in sp:
+            if type(seg) == ellipt:
+                R = max(seg.r1, seg.r2)
+                pts += [seg.c - complex(R, R), seg.c + complex(R, R)]
+            else: pts += seg.bounds()
+    return pointbounds(pts) if pts else None
+def strokereach(sty):
+    """How far the stroke of the (inherited) style sty can reach beyond the path; None if this is unknown."""
+    if sty.get("stroke", "none") == "none": return 0
+    try: w, ml = float(sty.get("stroke-width", "1")), float(sty.get("stroke-miterlimit", "4"))
+    except ValueError: return None
+    return w / 2 * (max(ml, sqrt(2)) if sty.get("stroke-linejoin", "miter") == "miter" else sqrt(2))
+def mergeable(node, sty):
+    """The style key of the path node (with inherited style sty) and its box grown by the stroke's reach, or None if it may not be merged."""
+    if node.tag != _svg + "path" or len(node) or not node.get("d") or any(k != "d" and k != "style" and k not in allstyle for k in node.keys()): return None
+    if refsof(node) or any(sty.get(p, "").startswith('u') for p in ("fill", "stroke")) or any(sty.get(m, "none") != "none" for m in ("marker", "marker-start", "marker-mid", "marker-end")): return None
+    if sty.get("stroke-dasharray", "none") != "none" or sty.get("vector-effect", "none") != "none": return None
+    reach, p = strokereach(sty), path(node.get("d"))
+    box = pathbounds(p)
+    if reach == None or box == None: return None
+    return tuple(sorted(obtainstyle(node).items())), p, (box[0] - complex(reach, reach), box[1] + complex(reach, reach))
+def mergepaths(rn):
+    """Merges the runs of sibling paths in rn that may be merged (see above) into compound paths; returns the number of nodes removed."""
+    removed = 0
+    def meets(a, b): return a[0].real <= b[1].real and b[0].real <= a[1].real and a[0].imag <= b[1].imag and b[0].imag <= a[1].imag
+    def walk(node, sty):
+        nonlocal removed
+        sty = dict(sty, **obtainstyle(node))
+        groups, cur = [], None
+        for k in node:
+            m = mergeable(k, dict(sty, **obtainstyle(k)))
+            if m and cur and cur[0] == m[0] and not any(meets(m[2], b) for b in cur[2]):
+                cur[1].append((k, m[1]))
+                cur[2].append(m[2])
+            else:
+                cur = m and [m[0], [(k, m[1])], [m[2]]]
+                if cur: groups.append(cur)
+        for key, members, boxes in groups:
+            if len(members) < 2: continue
+            first, whole = members[0][0], path("")
+            for k, p in members:
+                whole.segments += p.segments
+                whole.closed += p.closed
+                if k is not first: node.remove(k)
+            first.set("d", whole.tosvg())
+            removed += len(members) - 1
+        for k in node:
+            if k.tag != _svg + "path": walk(k, sty)
+    walk(rn, {})
+    return removed
+
+# Culling. World-space boxes come from composing the transforms down the tree and taking each shape's box (grown by the reach of its stroke)
+# through its matrix. Shapes whose boxes miss the viewport are dropped; so, optionally, are shapes whose boxes lie inside an opaque rectangle
+# painted later. Such occluders are filled rectangles (or paths tracing axis-aligned rectangles) under only translations and scalings, with
+# fully opaque fills and no opacity, clipping, masking, filtering or blending on them or their ancestors. Walking backwards in paint order, occluders
+# are put into a grid over the viewport; since an occluder containing a box contains its first corner, only that corner's cell is searched.
+# Text, <use>s, referenced nodes, anything under a filter or carrying markers and the insides of definitions are never culled.
+noninherited = ("filter", "clip-path", "mask", "opacity", "display", "mix-blend-mode")
+def svglength(x):
+    """The length x (a string with optional absolute units) in user units; raises AttributeError or KeyError if it cannot be read."""
+    x = x.strip()
+    n = num_re.match(x)
+    return float(n.group()) * units[x[n.end():]]
+def viewport(rn):
+    """Opposite corners of the part of the root's user space that can be seen, or None if it cannot be worked out.
+    Where width and height have another aspect ratio than the viewBox, preserveAspectRatio (by default xMidYMid meet)
+    shows more than the viewBox along one axis; slicing and "none" show no more than it."""
+    try:
+        vb = [float(n) for n in num_re.findall(rn.get("viewBox", ""))]
+        if len(vb) != 4: return 0j, complex(svglength(rn.get("width")), svglength(rn.get("height")))
+        lo, size = complex(vb[0], vb[1]), complex(vb[2], vb[3])
+        par = [w for w in rn.get("preserveAspectRatio", "").split() if w != "defer"] or ["xMidYMid"]
+        if par[0] == "none" or par[-1] == "slice" or rn.get("width") == None or rn.get("height") == None: return lo, lo + size # a missing length follows the viewBox
+        w, h = svglength(rn.get("width")), svglength(rn.get("height"))
+        k = min(w / size.real, h / size.imag)
+        seen = complex(w / k, h / k)
+        fx, fy = {"xMin": 0, "xMid": 0.5, "xMax": 1}[par[0][:4]], {"YMin": 0, "YMid": 0.5, "YMax": 1}[par[0][4:]]
+        lo -= complex((seen - size).real * fx, (seen - size).imag * fy)
+        return lo, lo + seen
+    except (AttributeError, KeyError, TypeError, ValueError, ZeroDivisionError): return None
+def localbox(node):
+    """Opposite corners of the box of the shape node in its own user space, or None if unknown."""
+    tag, g = node.tag[len(_svg):], lambda a: float(node.get(a, "0"))
+    try:
+        if tag == "path": return pathbounds(path(node.get("d", "")))
+        if tag in ("rect", "image"): return pointbounds([complex(g("x"), g("y")), complex(g("x") + g("width"), g("y") + g("height"))])
+        if tag in ("circle", "ellipse"):
+            r = complex(g("r"), g("r")) if tag == "circle" else complex(g("rx"), g("ry"))
+            return complex(g("cx"), g("cy")) - r, complex(g("cx"), g("cy")) + r
+        if tag == "line": return pointbounds([complex(g("x1"), g("y1")), complex(g("x2"), g("y2"))])
+        if tag in ("polyline", "polygon"):
+            nums = [float(n) for n in num_re.findall(node.get("points", ""))]
+            return pointbounds([complex(nums[i], nums[i + 1]) for i in range(0, len(nums) - 1, 2)])
+    except (ValueError, IndexError): pass
+    return None
+def worldbox(box, m):
+    return pointbounds([m @ box[0], m @ box[1], m @ complex(box[0].real, box[1].imag), m @ complex(box[1].real, box[0].imag)])
+def covers(node, m, sty, veiled = False):
+    """The world-space rectangle that the node certainly paints opaquely, or None if it is not an occluder. sty is the node's inherited style;
+    veiled says whether the node or an ancestor has opacity, clipping, masking, filtering, blending or display:none, which sty does not carry."""
+    if veiled or m.v[1] or m.v[2] or sty.get("fill-opacity", "1") not in ("1", "1.0") or sty.get("visibility", "visible") != "visible": return None
+    try:
+        if col2repr(sty.get("fill", "#000"))[3] != 1: return None
+    except (ValueError, IndexError, KeyError): return None # none, paint servers, currentColor and the like
+    if node.tag == _svg + "rect" and node.get("rx") == None and node.get("ry") == None: box = localbox(node)
+    elif node.tag == _svg + "path":
+        p = path(node.get("d", ""))
+        if len(p.segments) != 1 or not p.closed[0] or any(type(s) != bezier or s.deg != 1 for s in p.segments[0]): return None
+        pts = [s(0) for s in p.segments[0]]
+        box = pointbounds(pts)
+        if len(pts) != 4 or any(not (isclose(z.real, box[0].real) or isclose(z.real, box[1].real)) or not (isclose(z.imag, box[0].imag) or isclose(z.imag, box[1].imag)) for z in pts): return None
+        if len({(isclose(z.real, box[0].real), isclose(z.imag, box[0].imag)) for z in pts}) != 4: return None
+    else: return None
+    return box and worldbox(box, m)
+def cull(rn, occlusion = False, cells = 32):
+    """Removes the shapes of rn lying outside its viewport and, if occlusion is True, those hidden by opaque rectangles painted later.
+    Groups left empty are removed too. Returns the numbers of nodes culled for each reason."""
+    view = viewport(rn)
+    if view == None: return 0, 0
+    refd = set()
+    for k in rn.iter(): refd |= set(refsof(k).values())
+    skip = {_svg + t for t in ("defs", "clipPath", "mask", "marker", "pattern", "symbol", "switch", "svg", "text", "use", "foreignObject")}
+    order = [] # (node, world box, occluder box) in paint order
+    veils = lambda own: own.get("opacity", "1") not in ("1", "1.0") or own.get("display") == "none" or own.get("mix-blend-mode", "normal") != "normal" or any(own.get(p, "none") != "none" for p in ("clip-path", "mask"))
+    def walk(node, m, sty, filtered, veiled): # non-inherited properties are tracked apart, so that a child cannot override them
+        for k in list(node):
+            if k.tag in skip or k.tag in (_svg + "metadata", _svg + "title", _svg + "style", _svg + "script"): continue
+            own = obtainstyle(k)
+            km, ksty = m @ nodetf(k), {p: v for p, v in dict(sty, **own).items() if p not in noninherited}
+            kfiltered = filtered or own.get("filter", "none") != "none"
+            kveiled = veiled or kfiltered or veils(own)
+            if k.tag in containers:
+                walk(k, km, ksty, kfiltered, kveiled)
+                continue
+            box, reach = localbox(k), strokereach(ksty)
+            if box == None or reach == None or k.get("id") in refd or kfiltered or any(ksty.get(p, "none") != "none" for p in ("marker", "marker-start", "marker-mid", "marker-end")):
+                order.append((k, None, None))
+                continue
+            w = worldbox(box, km)
+            r = complex(reach, reach) * stretch(km)
+            order.append((k, (w[0] - r, w[1] + r), covers(k, km, ksty, kveiled) if occlusion else None))
+    own = obtainstyle(rn)
+    walk(rn, nodetf(rn), {p: v for p, v in own.items() if p not in noninherited}, own.get("filter", "none") != "none", veils(own))
+    size = view[1] - view[0]
+    cw, ch = (size.real or 1) / cells, (size.imag or 1) / cells
+    cellof = lambda z: (min(max(int((z.real - view[0].real) // cw), -1), cells), min(max(int((z.imag - view[0].imag) // ch), -1), cells))
+    grid, dead, off, hid = {}, set(), 0, 0
+    for k, box, occ in reversed(order):
+        if box != None:
+            if box[1].real < view[0].real or box[0].real > view[1].real or box[1].imag < view[0].imag or box[0].imag > view[1].imag:
+                dead.add(k)
+                off += 1
+                continue
+            c = cellof(box[0])
+            if any(o[0].real <= box[0].real and o[0].imag <= box[0].imag and box[1].real <= o[1].real and box[1].imag <= o[1].imag for o in grid.get(c, ())):
+                dead.add(k)
+                hid += 1
+                continue
+        if occ != None:
+            (i0, j0), (i1, j1) = cellof(occ[0]), cellof(occ[1])
+            for i in range(i0, i1 + 1):
+                for j in range(j0, j1 + 1): grid.setdefault((i, j), []).append(occ)
+    def prune(node): # removing one by one would take quadratic time
+        for k in node:
+            if k.tag in containers: prune(k)
+        node[:] = [k for k in node if k not in dead and not (k.tag in containers and not len(k) and k.get("id") == None)]
+    prune(rn)
+    return off, hid
+
+# Clip elimination. A clip does nothing when what it clips lies inside one of its shapes. Everything is worked out in the user space
+# of the clipped node, where userSpaceOnUse clip paths live: the content's box (strokes included) is found from the boxes of its shapes
+# through their transforms, and its corners are taken into each clip shape's own space. Rectangles, circles, ellipses and convex polygons
+# are convex, so the box lies inside such a shape whenever its corners do. Content with text, markers, filters or <use>s is left clipped,
+# as are clips in objectBoundingBox units or themselves clipped. Clip shapes that are undisplayed or invisible contribute nothing and are passed over.
+def contentbox(node, sty):
+    """Opposite corners of the box of everything node paints, in its user space (its transform not applied), or None if unknown.
+    sty is the inherited style."""
+    sty = dict(sty, **obtainstyle(node))
+    if sty.get("filter", "none") != "none" or any(sty.get(m, "none") != "none" for m in ("marker", "marker-start", "marker-mid", "marker-end")): return None
+    if node.tag in containers:
+        sty, pts = {k: v for k, v in sty.items() if k not in noninherited}, []
+        for k in node:
+            if k.tag in (_svg + "title", _svg + "desc", _svg + "metadata"): continue
+            b = contentbox(k, sty)
+            if b == None: return None
+            pts += worldbox(b, nodetf(k))
+        return pointbounds(pts) if pts else None
+    box, reach = localbox(node), strokereach(sty)
+    if box == None or reach == None: return None
+    return box[0] - complex(reach, reach), box[1] + complex(reach, reach)
+def inside(node, pts):
+    """Whether all the points pts (in node's user space) lie inside the clip shape node, if it is a rectangle, circle, ellipse or convex polygon."""
+    tag, g = node.tag[len(_svg):], lambda a: float(node.get(a, "0"))
+    try:
+        if tag == "rect":
+            if node.get("rx") != None or node.get("ry") != None: return False
+            return all(g("x") <= z.real <= g("x") + g("width") and g("y") <= z.imag <= g("y") + g("height") for z in pts)
+        if tag in ("circle", "ellipse"):
+            rx, ry = (g("r"), g("r")) if tag == "circle" else (g("rx"), g("ry"))
+            return rx > 0 and ry > 0 and all(((z.real - g("cx")) / rx) ** 2 + ((z.imag - g("cy")) / ry) ** 2 <= 1 for z in pts)
+        if tag in ("path", "polygon"):
+            if tag == "path":
+                p = path(node.get("d", ""))
+                if len(p.segments) != 1 or any(type(s) != bezier or s.deg != 1 for s in p.segments[0]): return False
+                poly = [s(0) for s in p.segments[0]] + [p.segments[0][-1](1)]
+            else:
+                nums = [float(n) for n in num_re.findall(node.get("points", ""))]
+                poly = [complex(nums[i], nums[i + 1]) for i in range(0, len(nums) - 1, 2)]
+            edges = [(a, b) for a, b in zip(poly, poly[1:] + poly[:1]) if a != b]
+            dirs = [b - a for a, b in edges]
+            if len(edges) < 3: return False
+            turns = [phase(w / v) for v, w in zip(dirs, dirs[1:] + dirs[:1])]
+            total = sum(turns) # ±2π for convex polygons, more for stars
+            if not (all(t >= 0 for t in turns) or all(t <= 0 for t in turns)) or abs(abs(total) - 2 * pi) > 1e-9: return False
+            return all(copysign(1, total) * cross(b, z, a) >= 0 for a, b in edges for z in pts)
+    except (ValueError, IndexError, ZeroDivisionError): return False
+    return False
+def unclip(rn):
+    """Removes the clip-path references in rn that cannot change what is drawn, then the clip paths no longer referenced.
+    Returns the number of references removed."""
+    clips = {k.get("id"): k for k in rn.iter(_svg + "clipPath") if k.get("id") != None}
+    removed, freed, seen = 0, set(), {}
+    def look(node, vis): # the visibility each clip path passes on to its children
+        vis = obtainstyle(node).get("visibility", vis)
+        if node.tag == _svg + "clipPath": seen[node] = vis
+        for k in node: look(k, vis)
+    look(rn, "visible")
+    def walk(node, sty):
+        nonlocal removed
+        target = refsof(node).get("clip-path")
+        clip = clips.get(target)
+        if clip != None and clip.get("clipPathUnits", "userSpaceOnUse") == "userSpaceOnUse" and "clip-path" not in obtainstyle(clip):
+            box = contentbox(node, sty)
+            if box != None:
+                m = nodetf(clip)
+                for k in clip:
+                    ksty = obtainstyle(k)
+                    if k.tag in nonrendering or "clip-path" in ksty or ksty.get("display") == "none" or ksty.get("visibility", seen[clip]) != "visible": continue
+                    try: back = ~(m @ nodetf(k))
+                    except ZeroDivisionError: continue
+                    if inside(k, [back @ z for z in (box[0], box[1], complex(box[0].real, box[1].imag), complex(box[1].real, box[0].imag))]):
+                        sd = expungestyle(node)
+                        sd.pop("clip-path", 0)
+                        distributestyle(node, sd)
+                        removed += 1
+                        freed.add(target)
+                        break
+        sty = {k: v for k, v in dict(sty, **obtainstyle(node)).items() if k not in noninherited}
+        for k in node: walk(k, sty)
+    walk(rn, {})
+    still = set()
+    for k in rn.iter(): still |= set(refsof(k).values())
+    for par in list(rn.iter()):
+        for k in list(par):
+            if k.tag == _svg + "clipPath" and k.get("id") in freed - still: par.remove(k)
+    return removed
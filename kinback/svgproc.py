@@ -1,10 +1,12 @@
 # Helper functions for Kinross: SVG node processing and simplification (Rarify's "Sweetie Belle", phases 2 and 3)
 # Parcly Taxel / Jeremy Tan, 2016
 # https://parclytaxel.tumblr.com
-from xml.etree.ElementTree import tostring
+from xml.etree.ElementTree import tostring, Element
+from itertools import count, product
+from string import ascii_letters, digits
 from xml.dom.minidom import parseString
-from .colours import shortcolour, shortdiaph
-from .regexes import stylecrunch
+from .colours import shortcolour, shortdiaph, col2repr, colourclusters
+from .regexes import stylecrunch, word_re, url_re
 from .affines import tf
 from .segment import ellipt
 def formalxml(rn):
@@ -234,17 +236,143 @@ def textwhack(node):
         sd = expungestyle(t)
         rm_default(sd, td)
         distributestyle(t, sd)
+def mergecolours(nodes, de):
+    """Merges the colours of the nodes' colour properties lying within de (CIE76 ΔE) of a more used colour into it (see colourclusters).
+    Returns the numbers of distinct colours before and after."""
+    uses = {}
+    for n in nodes:
+        sd = obtainstyle(n)
+        for c in chromaprops:
+            if c in sd: uses[sd[c]] = uses.get(sd[c], 0) + 1
+    cols = []
+    for c in uses:
+        if c != "none" and not c.startswith('u'):
+            try: cols.append((c, col2repr(c)))
+            except (ValueError, IndexError): pass # currentColor, inherit and the like
+    lead = colourclusters([r for c, r in cols], de, [uses[c] for c, r in cols])
+    rep = {cols[i][0]: shortcolour(cols[j][0]) for i, j in enumerate(lead) if i != j}
+    for n in nodes:
+        sd = obtainstyle(n)
+        if any(sd.get(c) in rep for c in chromaprops):
+            sd = expungestyle(n)
+            for c in chromaprops:
+                if sd.get(c) in rep: sd[c] = rep[sd[c]]
+            distributestyle(n, sd)
+    return len(uses), len(uses) - len(rep)
+# Style classes: every distinct style dictionary costs its nodes the bytes distributestyle() spends on it, against ' class="name"' per node
+# and a '.name{...}' rule once. Dictionaries are taken from the most used down and given the next shortest unused name if that saves bytes.
+def stylecost(sd):
+    if len(sd) < 4: return sum(len(p) + len(sd[p]) + 4 for p in sd)
+    return 9 + len(";".join(p + ":" + sd[p] for p in sd))
+def classnames(taken = ()):
+    """Yields the valid class names (and IDs) not in taken, shortest first."""
+    for n in count(1):
+        for c in product(ascii_letters, *[ascii_letters + digits] * (n - 1)):
+            if "".join(c) not in taken: yield "".join(c)
+def classify(rn, nodes, editable = False):
+    """Moves the style dictionaries shared by enough of the nodes into classes defined in a new <style> element at the start of rn.
+    If editable is True the shapes, LPE paths and text that Inkscape edits as such keep their styles. Nothing is done if rn already has
+    a <style>, as the classes would take precedence over its rules where the presentation attributes did not.
+    Returns the numbers of classes made and of nodes given them."""
+    if rn.find(".//" + _svg + "style") != None: return 0, 0
+    text = {_svg + t for t in ("text", "tspan", "flowRoot", "flowPara", "flowRegion", "textPath")}
+    users, taken = {}, set()
+    for n in nodes:
+        taken.update(n.get("class", "").split())
+        if n is rn or n.get("class") != None: continue
+        if editable and (n.tag in text or n.get(_sod + "type") != None or n.get(_ink + "original-d") != None): continue
+        sd = obtainstyle(n)
+        if sd: users.setdefault(tuple(sorted(sd.items())), []).append(n)
+    rules, names, classed = [], classnames(taken), 0
+    name = next(names)
+    for key in sorted(users, key=lambda k: -len(users[k])):
+        sd, us = dict(key), users[key]
+        rule = ";".join(p + ":" + v for p, v in key)
+        if len(us) * (stylecost(sd) - 9 - len(name)) <= len(name) + 3 + len(rule): continue
+        rules.append("." + name + "{" + rule + "}")
+        for n in us:
+            expungestyle(n)
+            n.set("class", name)
+        classed += len(us)
+        name = next(names)
+    if rules:
+        sty = Element(_svg + "style")
+        sty.text = "".join(rules)
+        rn.insert(0, sty)
+    return len(rules), classed
 def refsof(node):
     """Works out which nodes the input node references, whether by hashes or URIs. Assumes the style has already been canonised."""
     rf, sd = {}, obtainstyle(node)
-    for a in ("fill", "stroke", "clip-path", "mask", "filter"):
+    for a in ("fill", "stroke", "clip-path", "mask", "filter", "marker", "marker-start", "marker-mid", "marker-end"):
         if a in sd and sd[a][0] == 'u': rf[a] = sd[a][5:-1]
     tmp = node.get(_xln + "href")
-    if tmp: rf["use"] = tmp[1:]
+    if tmp and tmp[0] == "#": rf["use"] = tmp[1:] # external files and data URIs are not references
     tmp = node.get(_ink + "path-effect")
     if tmp: rf["path-effect"] = tmp[1:]
     return rf
 
+# Deduplication of definitions. Each child of a <defs> is keyed by its tag, attributes (IDs excluded, styles canonised by weakwhack),
+# text and children's keys, with every reference to another definition replaced by that definition's representative, which is
+# the first definition found with the same key. Representatives are memoised, so every node is keyed once.
+def dedupdefs(rn):
+    """Merges the definitions in rn that are identical but for IDs, pointing all references at the first of each set, and removes the rest.
+    Definitions with referenced descendants are left alone. Returns the number of definitions removed."""
+    holders = rn.findall(".//" + _svg + "defs")
+    byid = {k.get("id"): k for d in holders for k in d if k.get("id") != None}
+    refd = {i for k in rn.iter() for i in refsof(k).values()}
+    canon, keys, busy = {}, {}, set()
+    def rep(i):
+        if i not in byid or i in busy: return i
+        if i not in canon:
+            busy.add(i)
+            node = byid[i]
+            k = key(node) if not any(d.get("id") in refd for d in node.iter() if d is not node) else i
+            busy.discard(i)
+            canon[i] = keys.setdefault(k, i)
+        return canon[i]
+    def key(node):
+        weakwhack(node)
+        sd, atb = obtainstyle(node), {k: v for k, v in node.items() if k != "id" and k != "style" and k not in allstyle}
+        for kind, target in refsof(node).items():
+            if kind == "use": atb[_xln + "href"] = "#" + rep(target)
+            elif kind == "path-effect": atb[_ink + "path-effect"] = "#" + rep(target)
+            else: sd[kind] = "url(#{})".format(rep(target))
+        return (node.tag, tuple(sorted(atb.items())), tuple(sorted(sd.items())), node.text, tuple(key(k) for k in node))
+    for i in byid: rep(i)
+    moved = {i: c for i, c in canon.items() if i != c}
+    if not moved: return 0
+    for k in rn.iter():
+        if any(target in moved for target in refsof(k).values()): remap(k, moved)
+    for d in holders: d[:] = [k for k in d if k.get("id") not in moved] # removing one by one would take quadratic time
+    return len(moved)
+
+def remap(node, mp):
+    """Points every reference of node (see refsof()) to an ID in the dictionary mp at the ID it maps to, all at once,
+    so that references already pointing at a new ID are left alone."""
+    for a in (_xln + "href", _ink + "path-effect"):
+        v = node.get(a)
+        if v and v[0] == "#" and v[1:] in mp: node.set(a, "#" + mp[v[1:]])
+    for a, v in node.items():
+        if "url(#" in v: node.set(a, url_re.sub(lambda m: "url(#{})".format(mp.get(m.group(1), m.group(1))), v))
+
+# Renaming of referenced IDs to the shortest names available, the most referenced first. IDs that appear as words in scripts, event handlers
+# or stylesheets may be looked up from there, so they are neither renamed nor given to another node.
+def renameids(rn):
+    """Renames the referenced IDs in rn and rewrites their references; returns the number of IDs renamed."""
+    index, owners, words = {}, {}, set()
+    for k in rn.iter():
+        if k.get("id") != None: owners[k.get("id")] = k
+        for kind, target in refsof(k).items(): index.setdefault(target, []).append((k, kind))
+        if k.tag in (_svg + "script", _svg + "style"): words.update(word_re.findall(k.text or ""))
+        for a, v in k.items():
+            if a.startswith("on"): words.update(word_re.findall(v))
+    movable = sorted((i for i in index if i in owners and i not in words), key=lambda i: -len(index[i]))
+    names = classnames(words | (set(owners) - set(movable)))
+    mp = {i: next(names) for i in movable} # the whole map first, so that every reference is rewritten once from its old ID
+    for i in movable: owners[i].set("id", mp[i])
+    for k in {k for i in movable for k, kind in index[i]}: remap(k, mp)
+    return len(movable)
+
 # Higher-order functions (involving some maths) follow
 def path2oval(arc):
     """With a Sodipodi arc that is also an ellipse, converts it into a real ellipse; does not process transformations or further simplify into a circle."""
@@ -253,9 +381,10 @@ def path2oval(arc):
         del arc.attrib[_sod + "type"]
         arc.attrib.pop("d", 0)
         arc.tag = _svg + "ellipse"
-def ellipsecollapse(ell):
-    """Given a transformed ellipse element, collapses the transform into the ellipse if it has no stroke and then converts into a circle if applicable."""
-    if ell.get("stroke") == None and "stroke" not in stylecrunch(ell.get("style", "")): # ensures that no transformation of the stroke is lost
+def ellipsecollapse(ell, strokesafe = False):
+    """Given a transformed ellipse element, collapses the transform into the ellipse if it has no stroke and then converts into a circle if applicable.
+    strokesafe, if True, skips the stroke check for callers that have already made sure the stroke will not be distorted."""
+    if strokesafe or ell.get("stroke") == None and "stroke" not in stylecrunch(ell.get("style", "")): # ensures that no transformation of the stroke is lost
         tfstr = ell.get("transform", "rotate(0)")
         if "rotate" not in tfstr or tfstr.count('(') > 1:
             e, t, oth = ellipt.fromsvg_node(ell)
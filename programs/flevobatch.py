@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# Flevobézier in batch: refits the subpaths of whole SVG files outside Inkscape, spreading them over a pool of processes.
+# Subpaths are independent of each other, so each one is a separate job; the results are written back with Kinback's path writer.
+# Parcly Taxel / Jeremy Tan, 2016
+# https://parclytaxel.tumblr.com
+import os, time, argparse
+import xml.etree.ElementTree as t
+from concurrent.futures import ProcessPoolExecutor
+from kinback.pathery import path
+from kinback.segment import bezier
+from kinback.svgproc import svgnms, nm_findall, _sod
+from kinback.flevo import flevobezier, flevofit
+
+def fitsub(job):
+    """Fits one subpath given as (nodes, closedness, whether to use the incremental fitter); returns (fitted nodes or None on failure, seconds taken)."""
+    nodes, z, incremental = job
+    begin = time.perf_counter()
+    try: res = (flevofit if incremental else flevobezier)(nodes, z)
+    except (ValueError, ZeroDivisionError): res = None # degenerate strings (repeated nodes and the like) are left as they are
+    return res, time.perf_counter() - begin
+
+def flevobatch(f, pool, ids = None, incremental = False, jobs = 1):
+    """Fits the paths of the SVG file f (or those with the given IDs) on the process pool, which has jobs workers, and writes the result to <name>-fitted.svg.
+    Returns the numbers of paths and subpaths fitted."""
+    tr = t.parse(f)
+    rn = tr.getroot()
+    begin = time.perf_counter()
+    if ids: targets = [p for p in (rn.find(".//*[@id='{}']".format(i)) for i in ids) if p != None and p.get("d")]
+    else: targets = [p for p in rn.findall(".//svg:path", nm_findall) if p.get("d") and p.get(_sod + "type") == None]
+    parsed, work, owners = [path(p.get("d")) for p in targets], [], []
+    for n, p in enumerate(parsed):
+        for k, (sp, z) in enumerate(zip(p.segments, p.closed)):
+            if sp:
+                work.append(([sp[0](0)] + [seg(1) for seg in sp], z, incremental))
+                owners.append((n, k))
+    results = pool.map(fitsub, work, chunksize=max(1, len(work) // (4 * jobs)))
+    spent = [0] * len(targets)
+    for (n, k), (res, dt) in zip(owners, results):
+        spent[n] += dt
+        if res: parsed[n].segments[k] = [bezier(*res[i:i + 4]) for i in range(0, len(res) - 1, 3)]
+    for n, (p, pth) in enumerate(zip(parsed, targets)):
+        before = sum(len(sp) + 1 for sp in path(pth.get("d")).segments)
+        pth.set("d", p.tosvg())
+        print("  {}: {} subpaths, {} → {} nodes, {:.1f} ms".format(pth.get("id", "#{}".format(n)), len(p.segments), before, sum(len(sp) + 1 for sp in p.segments), spent[n] * 1000))
+    outfn = "{0}-fitted.svg".format(f[:-4])
+    tr.write(outfn, "unicode")
+    print("{}: {} paths, {} subpaths in {:.3f} s ({:.3f} s of fitting over {} processes)".format(f, len(targets), len(work), time.perf_counter() - begin, sum(spent), jobs))
+    return len(targets), len(work)
+
+if __name__ == "__main__":
+    for n in svgnms: t.register_namespace(n, svgnms[n])
+    cdl = argparse.ArgumentParser(prog="./flevobatch.py", description="Flevobézier in batch, fitting every path of the given SVG files (or the selected ones)")
+    cdl.add_argument("-i", "--incremental", action="store_true", default=False, help="use the incremental least-squares fitter instead of stress theory")
+    cdl.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="number of worker processes (default: one per CPU)")
+    cdl.add_argument("-s", "--select", dest="ids", action="append", metavar="ID", help="fit only the path with this ID (may be repeated)")
+    cdl.add_argument("files", nargs="+", help="SVG files to process; output goes to <name>-fitted.svg")
+    flags = cdl.parse_args()
+    with ProcessPoolExecutor(flags.jobs) as pool:
+        for f in flags.files:
+            if not f.endswith("-fitted.svg"): flevobatch(f, pool, flags.ids, flags.incremental, flags.jobs)
@@ -4,8 +4,10 @@
 # See https://parclytaxel.tumblr.com/post/136659988109/the-distribution-of-pony-colours for the workings and data behind this script.
 # Parcly Taxel / Jeremy Tan, 2016
 # https://parclytaxel.tumblr.com
-import random, sys
+import random, sys, csv, json, argparse
 from cmath import rect
+try: import numpy as np
+except ImportError: np = None
 rng = random.SystemRandom()
 
 def lx(k): return k ** 3 if k > 6 / 29 else 108 / 841 * (k - 4 / 29)
@@ -51,13 +53,62 @@ def eyesgen(gender):
         col = lch2rgb(l * 100, c * 100, h)
     return col
 
-if len(sys.argv) != 3 or not sys.argv[1].isdecimal() or not sys.argv[2].isdecimal():
-    print("Usage: " + sys.argv[0] + " [number of mares] [number of stallions]")
-    sys.exit(1)
-mares, stallions = max(int(sys.argv[1]), 0), max(int(sys.argv[2]), 0)
-if mares:
-    print("Mare colours (coat, mane, eyes):")
-    for q in range(mares): print("#{}, #{}, #{}".format(coatgen(0), manegen(0), eyesgen(0)))
-if stallions:
-    print("Stallion colours (coat, mane, eyes):")
-    for q in range(stallions): print("#{}, #{}, #{}".format(coatgen(1), manegen(1), eyesgen(1)))
+# Batch mode: whole arrays of candidate colours are drawn and converted at once, and only the out-of-gamut rows are drawn again.
+# The constants are those above; the hue mixture weights are 3/7 and 4/7 for coats and manes, 1/5, 1/5 and 3/5 for eyes.
+def lch2rgbs(l, c, h):
+    """Vectorised lch2rgb(): returns the n × 3 array of sRGB components and the mask of the rows in gamut."""
+    j = (l + 16) / 116
+    lxs = lambda k: np.where(k > 6 / 29, k ** 3, 108 / 841 * (k - 4 / 29))
+    xyz = np.stack((0.95047 * lxs(j + c * np.cos(h) / 500), lxs(j), 1.08883 * lxs(j - c * np.sin(h) / 200)), 1)
+    lin = xyz @ np.array([[3.24062548, -1.53720797, -.49862860], [-.96893071, 1.87575606, .04151752], [.05571012, -.20402105, 1.05699594]]).T
+    rgb = np.where(lin <= 0.0031308, 12.92 * lin, 1.055 * np.abs(lin) ** (1 / 2.4) - 0.055)
+    return rgb, ((rgb >= 0) & (rgb <= 1)).all(1)
+def colourbatch(g, nums, weights, n):
+    """n colours (as an n × 3 array of sRGB components) drawn from the distribution with constants nums and hue mixture weights,
+    using the NumPy generator g."""
+    res, todo = np.empty((n, 3)), np.arange(n)
+    mu, kappa, cum = np.array([v[0] for v in nums[2:]]), np.array([v[1] for v in nums[2:]]), np.cumsum(weights[:-1])
+    while todo.size:
+        m = todo.size
+        k = np.searchsorted(cum, g.random(m), "right")
+        rgb, ok = lch2rgbs(g.beta(*nums[0], m) * 100, g.gamma(*nums[1], m) * 100, g.vonmises(mu[k], kappa[k]))
+        res[todo[ok]] = rgb[ok]
+        todo = todo[~ok]
+    return res
+def hexes(rgb):
+    """The hex strings of the rows of an array of sRGB components."""
+    q = np.rint(rgb * 255).astype(np.int64)
+    return ["{:06x}".format(v) for v in (q[:, 0] << 16 | q[:, 1] << 8 | q[:, 2]).tolist()]
+def palettes(n, gender, g = None):
+    """Lists of n coat, mane and eye colours (as hex strings) for the gender (0 for mares, 1 for stallions)."""
+    if np == None: raise ImportError("batch mode requires NumPy")
+    if g == None: g = np.random.default_rng()
+    return [hexes(colourbatch(g, cons[gender], w, n)) for cons, w in ((coatcons, (3 / 7, 4 / 7)), (manecons, (3 / 7, 4 / 7)), (eyescons, (1 / 5, 1 / 5, 3 / 5)))]
+
+def writepalettes(out, fmt, mares, stallions, g = None):
+    rows = [(sex, "#" + a, "#" + b, "#" + c) for sex, n in (("mare", mares), ("stallion", stallions)) for a, b, c in zip(*palettes(n, sex == "stallion", g))]
+    if fmt == "csv":
+        w = csv.writer(out, lineterminator="\n")
+        w.writerow(("sex", "coat", "mane", "eyes"))
+        w.writerows(rows)
+    else:
+        json.dump([dict(zip(("sex", "coat", "mane", "eyes"), r)) for r in rows], out, indent=1)
+        out.write("\n")
+
+if __name__ == "__main__":
+    cdl = argparse.ArgumentParser(prog=sys.argv[0], description="Pony colour scheme generator")
+    cdl.add_argument("-f", "--format", choices=("csv", "json"), help="generate the palettes in batch (with NumPy) and print them in this format")
+    cdl.add_argument("-s", "--seed", type=int, help="seed for batch mode")
+    cdl.add_argument("mares", type=int, help="number of mares")
+    cdl.add_argument("stallions", type=int, help="number of stallions")
+    flags = cdl.parse_args()
+    mares, stallions = max(flags.mares, 0), max(flags.stallions, 0)
+    if flags.format:
+        writepalettes(sys.stdout, flags.format, mares, stallions, np.random.default_rng(flags.seed))
+        sys.exit()
+    if mares:
+        print("Mare colours (coat, mane, eyes):")
+        for q in range(mares): print("#{}, #{}, #{}".format(coatgen(0), manegen(0), eyesgen(0)))
+    if stallions:
+        print("Stallion colours (coat, mane, eyes):")
+        for q in range(stallions): print("#{}, #{}, #{}".format(coatgen(1), manegen(1), eyesgen(1)))
@@ -3,14 +3,19 @@
 # This was originally motivated by the need to generate plausible patterns for MLPFIM vectors, but can be fine-tuned.
 # Parcly Taxel / Jeremy Tan, 2016
 # https://parclytaxel.tumblr.com
+from math import pi
 from cmath import polar, rect
+from xml.sax.saxutils import quoteattr
 import xml.etree.ElementTree as t
+try: import numpy as np
+except ImportError: np = None
 from kinback.affines import tf
 from kinback.segment import ellipt
-from kinback.discord import KinrossRandom, rectpointpick
+from kinback.discord import rng, rectpointpick, tileddisc
 sp = "{http://sodipodi.sourceforge.net/DTD/sodipodi-0.dtd}"
+xl = "{http://www.w3.org/1999/xlink}"
 t.register_namespace("sodipodi", sp[1:-1])
-rng = KinrossRandom()
+# This is the generator kinback.discord's point pickers use; rng.setbackend("mt", seed) makes the spallations reproducible.
 
 # spallate() requires four arguments:
 # 1. The object to make copies of as an SVG element object.
@@ -23,48 +28,144 @@ def spallate(obj, rtf, dens, size = 1000+1000j):
     for q in range(round(size.real * size.imag * dens * 1e-4)): rn.append(handletransform(obj, rtf(size)))
     return rn
 
-def handletransform(item, tfs):
+# spallatedisc() places the copies at Poisson-disc points instead, no two closer than r, so that they never clump; ptf makes the transformation string
+# from a copy's position. The points are sampled in tiles over jobs worker processes (see kinback.discord.tileddisc) and are fixed by seed if given.
+def spallatedisc(obj, ptf, r, size = 1000+1000j, jobs = None, seed = None):
+    rn = t.Element("svg", {"viewBox": "0 0 {} {}".format(size.real, size.imag)})
+    for pos in tileddisc(size, r, jobs=jobs, seed=seed): rn.append(handletransform(obj, ptf(pos)))
+    return rn
+
+# spallatestream() writes the spallation straight to the text stream out (a file, or a socket's makefile("w")) instead of building it,
+# chunk characters at a time, so that memory use does not grow with the number of copies; it returns that number. With symbol set the object is written
+# once as a <symbol> and the copies are <use> elements referring to it, carrying only the transformation.
+def spallatestream(out, obj, rtf, dens, size = 1000+1000j, symbol = False, chunk = 1 << 16):
+    count = round(size.real * size.imag * dens * 1e-4)
+    if symbol: copies = ('<use xlink:href="#spall" transform={}/>'.format(quoteattr(rtf(size))) for q in range(count))
+    else: copies = (xmlelement(*transformed(obj, rtf(size))) for q in range(count))
+    writesvg(out, obj if symbol else None, copies, size, chunk)
+    return count
+def writesvg(out, symbol, copies, size, chunk):
+    """Writes an SVG document with the given element strings to out, chunk characters at a time, defining the element symbol as #spall if given."""
+    buf = ['<svg xmlns="http://www.w3.org/2000/svg" xmlns:sodipodi="{}" xmlns:xlink="{}" viewBox="0 0 {} {}">'.format(sp[1:-1], xl[1:-1], size.real, size.imag)]
+    if symbol != None: buf.append('<defs><symbol id="spall" overflow="visible">{}</symbol></defs>'.format(xmlelement(symbol.tag, symbol.attrib)))
+    filled = 0
+    for s in copies:
+        buf.append(s)
+        filled += len(s)
+        if filled >= chunk:
+            out.write("".join(buf))
+            buf, filled = [], 0
+    buf.append("</svg>\n")
+    out.write("".join(buf))
+def xmlelement(tag, atb):
+    names = lambda n: n.replace(sp, "sodipodi:").replace(xl, "xlink:")
+    return "<{}{}/>".format(tag, "".join(" {}={}".format(names(k), quoteattr(v)) for k, v in atb.items()))
+
+# The tag and attributes of a copy of item under the transformation string tfs, which is absorbed into circles, ellipses and conformally transformed stars
+def handletransform(item, tfs): return t.Element(*transformed(item, tfs))
+def transformed(item, tfs):
     if item.tag == "circle" or item.tag == "ellipse":
         m = tf.fromsvg(tfs)
         e, u, oth = ellipt.fromsvg_node(item)
         tag, atb = (m @ u @ e).tosvg_node()
         atb.update(oth)
-        return t.Element(tag, atb)
+        return tag, atb
     if item.get(sp + "type") == "star":
         m = tf.fromsvg(tfs)
         if m.isconformal():
             others = item.attrib.copy()
-            centre = m @ complex(float(item.get(sp + "cx", "0")), float(item.get(sp + "cy", "0")))
-            np1 = m @ rect(float(item.get(sp + "r1")), float(item.get(sp + "arg1")))
-            np2 = m @ rect(float(item.get(sp + "r2")), float(item.get(sp + "arg2")))
+            c0 = complex(float(item.get(sp + "cx", "0")), float(item.get(sp + "cy", "0")))
+            centre = m @ c0
+            np1 = m @ (c0 + rect(float(item.get(sp + "r1")), float(item.get(sp + "arg1"))))
+            np2 = m @ (c0 + rect(float(item.get(sp + "r2")), float(item.get(sp + "arg2"))))
             r1, arg1 = polar(np1 - centre)
             r2, arg2 = polar(np2 - centre)
             nparams = {sp + "cx": str(centre.real), sp + "cy": str(centre.imag), sp + "r1": str(round(r1, 3)),
                        sp + "r2": str(round(r2, 3)), sp + "arg1": str(round(arg1, 7)), sp + "arg2": str(round(arg2, 7))}
             others.update(nparams)
-            return t.Element("path", others)
+            return "path", others
     props = item.attrib.copy()
     props["transform"] = tfs
-    return t.Element(item.tag, props)
+    return item.tag, props
+
+# Vectorised spallation. vtf(size, n) returns arrays of the n copies' positions (complex), scales and rotations (in degrees), and spallatearrays()
+# turns them into the copies' element strings in NumPy batches of up to batch copies: circles and ellipses get new centres, radii and rotations,
+# stars new sodipodi parameters, and anything else a transform attribute. The numbers are only formatted at the end of each batch.
+# The result is an iterable that writesvg() or spallatevector() can consume.
+def spallatearrays(obj, vtf, n, size = 1000+1000j, batch = 1 << 16):
+    if np == None: raise ImportError("vectorised spallation requires NumPy")
+    if obj.tag in ("circle", "ellipse"):
+        e, u, others = ellipt.fromsvg_node(obj)
+        e = u @ e
+        oth = "".join(" {}={}".format(k, quoteattr(v)) for k, v in others.items())
+    elif obj.get(sp + "type") == "star":
+        g = lambda k, d = "0": float(obj.get(sp + k, d))
+        c0 = complex(g("cx"), g("cy"))
+        oth = xmlelement("path", {k: v for k, v in obj.attrib.items() if not k.startswith(sp) or k[len(sp):] not in ("cx", "cy", "r1", "r2", "arg1", "arg2")})[5:-2]
+    else: oth = xmlelement(obj.tag, {k: v for k, v in obj.attrib.items() if k != "transform"})[len(obj.tag) + 1:-2]
+    for b in range(0, n, batch):
+        pos, scale, twist = vtf(size, min(batch, n - b))
+        rot = np.exp(1j * np.radians(twist)) * scale
+        if obj.tag in ("circle", "ellipse"):
+            c = pos + rot * e.c
+            if e.r1 == e.r2:
+                yield from map('<circle r="{}" cx="{}" cy="{}"{}/>'.format, nums(scale * e.r1), nums(c.real), nums(c.imag), [oth] * c.size)
+                continue
+            th = (e.th + np.radians(twist)) % pi
+            flip = th >= pi / 2
+            rx, ry, th = np.where(flip, scale * e.r2, scale * e.r1), np.where(flip, scale * e.r1, scale * e.r2), np.where(flip, th - pi / 2, th)
+            o = c * np.exp(-1j * th)
+            rots = ["" if t == "0" else ' transform="rotate({})"'.format(t) for t in nums(np.degrees(th))]
+            yield from map('<ellipse rx="{}" ry="{}"{} cx="{}" cy="{}"{}/>'.format, nums(rx), nums(ry), rots, nums(o.real), nums(o.imag), [oth] * c.size)
+        elif obj.get(sp + "type") == "star":
+            c, ang = pos + rot * c0, np.radians(twist)
+            yield from map('<path sodipodi:cx="{}" sodipodi:cy="{}" sodipodi:r1="{}" sodipodi:r2="{}" sodipodi:arg1="{}" sodipodi:arg2="{}"{}/>'.format,
+                           nums(c.real), nums(c.imag), nums(scale * g("r1")), nums(scale * g("r2")), nums(g("arg1") + ang, 7), nums(g("arg2") + ang, 7), [oth] * c.size)
+        else: yield from map(('<' + obj.tag + '{} transform="translate({} {})rotate({})scale({})"/>').format,
+                             [oth] * pos.size, nums(pos.real), nums(pos.imag), nums(twist), nums(scale))
+def spallatevector(out, obj, vtf, dens, size = 1000+1000j, chunk = 1 << 16):
+    """spallatestream() for vtf functions, writing the copies from spallatearrays(); returns the number of copies."""
+    if np == None: raise ImportError("vectorised spallation requires NumPy")
+    count = round(size.real * size.imag * dens * 1e-4)
+    writesvg(out, None, spallatearrays(obj, vtf, count, size), size, chunk)
+    return count
+def nums(a, d = 3):
+    """Strings of the numbers in the array a rounded to d places, without trailing zeros."""
+    return [s[:-2] if s.endswith(".0") else s for s in map(repr, (np.round(a, d) + 0.0).tolist())]
 
 # Examples of the function's use below; object/density fixed
 # For the astroid sparkles in Nightmare Rarity's mane
 astroid = t.Element("path", {"d": "M-5,0C-2-1-1-4 0-11 1-4 2-1 5,0 2,1 1,4 0,11-1,4-2,1-5,0Z", "fill": "#fff"})
-def rtf_astroid(size):
-    pos, scale = rectpointpick(size), 1 + min(rng.geometricvariate(2 / 3), 4) / 4
+def ptf_astroid(pos):
+    scale = 1 + min(rng.geometricvariate(2 / 3), 4) / 4
     return "translate({} {})scale({})".format(round(pos.real, 3), round(pos.imag, 3), scale)
+def rtf_astroid(size): return ptf_astroid(rectpointpick(size))
 def spallate_astroid(size = 1100+1400j): return spallate(astroid, rtf_astroid, 2, size)
+def vtf_astroid(size, n):
+    g = rng.npgen()
+    return size.real * g.random(n) + 1j * size.imag * g.random(n), 1 + np.minimum(rng.geometricvariate(2 / 3, n), 4) / 4, np.zeros(n)
+def spallatedisc_astroid(size = 1100+1400j, r = 40): return spallatedisc(astroid, ptf_astroid, r, size)
 
 # For the Equestrian night sky
 circle = t.Element("circle", {"r": "1", "fill": "#b4a8fe"})
-def rtf_circle(size):
-    pos, scale = rectpointpick(size), 3.5 + 1.5 * min(rng.geometricvariate(2 / 3), 5)
+def ptf_circle(pos):
+    scale = 3.5 + 1.5 * min(rng.geometricvariate(2 / 3), 5)
     return "translate({} {})scale({})".format(round(pos.real, 3), round(pos.imag, 3), scale)
+def rtf_circle(size): return ptf_circle(rectpointpick(size))
 def spallate_circle(size = 1000+1000j): return spallate(circle, rtf_circle, 2.5, size)
+def vtf_circle(size, n):
+    g = rng.npgen()
+    return size.real * g.random(n) + 1j * size.imag * g.random(n), 3.5 + 1.5 * np.minimum(rng.geometricvariate(2 / 3, n), 5), np.zeros(n)
+def spallatedisc_circle(size = 1000+1000j, r = 30): return spallatedisc(circle, ptf_circle, r, size)
 
 # For the sparkles of magic auras and Luna's mane
 star = t.Element("path", {"fill": "#b6ecff", sp + "type": "star", sp + "sides": "4", sp + "r1": "4.8", sp + "r2": "0.6", sp + "arg1": "0", sp + "arg2": "0.78539816"})
-def rtf_star(size):
-    pos, scale, twist = rectpointpick(size), min(rng.geometricvariate(3 / 5), 4) + 1, rng.random() * 90
+def ptf_star(pos):
+    scale, twist = min(rng.geometricvariate(3 / 5), 4) + 1, rng.random() * 90
     return "translate({} {})rotate({})scale({})".format(round(pos.real, 3), round(pos.imag, 3), twist, scale)
+def rtf_star(size): return ptf_star(rectpointpick(size))
 def spallate_star(size = 1000+1000j): return spallate(star, rtf_star, 1.5, size)
+def vtf_star(size, n):
+    g = rng.npgen()
+    return size.real * g.random(n) + 1j * size.imag * g.random(n), np.minimum(rng.geometricvariate(3 / 5, n), 4) + 1.0, 90 * g.random(n)
+def spallatedisc_star(size = 1000+1000j, r = 35): return spallatedisc(star, ptf_star, r, size)
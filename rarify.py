@@ -2,18 +2,22 @@
 # Rarify, the uncouth SVG optimiser
 # Parcly Taxel / Jeremy Tan, 2016
 # https://parclytaxel.tumblr.com
-import os, time, argparse
+import os, time, argparse, mmap
 import xml.etree.ElementTree as t
 from glob import glob
 from kinback.svgproc import *
+from kinback.svggeom import bake, simplifynode, roundgeometry, mergepaths, cull, unclip
 from kinback.affines import tf
+from kinback.rasters import stow, splice, recompress
 tr, rn = None, None
 
+def treesize(rn): return len(t.tostring(rn, "unicode").encode())
 def rarify(f):
-    global t
-    tr = t.parse(f)
-    rn = tr.getroot()
-    begin = time.perf_counter()
+    with open(f, "rb") as inf: src = mmap.mmap(inf.fileno(), 0, access=mmap.ACCESS_READ)
+    doc, payloads = stow(src) # large data URIs (embedded images) stay in the memory map, out of the tree
+    rn = t.fromstring(doc)
+    tr = t.ElementTree(rn)
+    begin, notes = time.perf_counter(), []
     # 1: node tree operations
     for nv in rn.findall("sodipodi:namedview", nm_findall): rn.remove(nv)
     # Embrittlement of zero-length groups
@@ -43,12 +47,40 @@ def rarify(f):
     mdelem = set(rn.findall(".//svg:title", nm_findall) + rn.findall(".//svg:metadata", nm_findall) + rn.findall(".//svg:metadata//*", nm_findall))
     actual = set([rn] + rn.findall(".//*")) - templates - mdelem
     for n in actual: whack(n, flags.lpecrush)
-    for t in templates: weakwhack(t)
+    for tp in templates: weakwhack(tp)
     if flags.dimens: [rn.attrib.pop(span, 0) for span in ("height", "width", "viewBox")]
     # 2c: further processing on text objects
     for words in rn.findall(".//svg:text", nm_findall): textwhack(words)
+    # 2c': merging of perceptually close colours
+    if flags.colours != None:
+        nb, na = mergecolours(actual | templates, flags.colours)
+        notes.append("{} → {} distinct colours".format(nb, na))
+    # 2d: path simplification within the given tolerance
+    if flags.simplify != None:
+        nb, na, spent = 0, 0, time.perf_counter()
+        for pth in rn.findall(".//svg:path", nm_findall):
+            if pth in actual:
+                res = simplifynode(pth, flags.simplify)
+                if res: nb, na = nb + res[0], na + res[1]
+        spent = time.perf_counter() - spent
+        if nb: notes.append("{} → {} path nodes ({:.2%}), {:.0f} nodes/s".format(nb, na, na / nb, nb / spent))
+    # 2e: culling of objects outside the viewport or hidden under opaque rectangles
+    if flags.cull or flags.occluded:
+        N, M = cull(rn, flags.occluded)
+        notes.append("{} objects off the canvas and {} hidden culled".format(N, M))
+    # 2f: removal of clips that clip nothing
+    if flags.unclip:
+        N = unclip(rn)
+        notes.append("{} clips removed".format(N))
+    # 2g: recompression of embedded PNGs
+    if flags.zlib:
+        N, M = recompress(payloads)
+        notes.append("{} PNGs recompressed, {:+} bytes".format(N, -M))
     # 3: reference tree pruning
-    # 3a: reference map with temporary IDs
+    # 3a: merging of duplicate definitions
+    N = dedupdefs(rn)
+    if N: notes.append("{} duplicate defs merged".format(N))
+    # 3b: reference map with temporary IDs
     rd, cnt, reob = {}, 0, set() # rd = reference dictionary
     for k in rn.findall(".//*"):
         cits, irk = refsof(k), k.get("id")
@@ -58,35 +90,60 @@ def rarify(f):
             k.set("id", irk)
         rd[irk] = cits
         for i in cits: reob.add(cits[i])
-    # 3b: unreferenced IDs
+    # 3c: unreferenced IDs
     for rm in set(rd.keys()) - reob: del rn.find(".//*[@id='{0}']".format(rm), nm_findall).attrib["id"]
     if rn.get("id") != None: del rn.attrib["id"]
-    # 3c: unused <defs>
+    # 3d: unused <defs>
     df, ud = rn.find(".//svg:defs", nm_findall), []
     if df != None:
         for dlm in df:
             if dlm.get("id") == None: ud.append(dlm)
         for z in ud: df.remove(z)
         if not len(list(df)): rn.remove(df)
+    # 3e: shortest names for the remaining IDs
+    if flags.rename:
+        size = treesize(rn)
+        N = renameids(rn)
+        notes.append("{} IDs renamed, {:+} bytes".format(N, treesize(rn) - size))
     # 3.5: transcoding of ellipses represented as paths into actual circles and ellipses
     for pce in rn.findall(".//svg:path[@sodipodi:type='arc']", nm_findall): path2oval(pce)
     # 4: transformation processing
-    # 4a: collapsing into unstroked, untransformed ellipses that reference no other objects
+    # 4a: baking of transforms into geometry
+    if flags.bake:
+        size = treesize(rn)
+        N = bake(rn)
+        notes.append("{} transforms baked, {:+} bytes".format(N, treesize(rn) - size))
+    # 4b: collapsing into unstroked, untransformed ellipses that reference no other objects
     for b in rn.findall(".//svg:ellipse", nm_findall):
         if not refsof(b): ellipsecollapse(b)
-    # 4b: affine simplification
+    # 4c: affine simplification
     for withtf in rn.findall(".//*[@transform]", nm_findall):
         new = tf.minstr(withtf.get("transform"))
-        if not new: del withtf.attrib[transform]
+        if not new: del withtf.attrib["transform"]
         else: withtf.set("transform", new)
+    # 4d: merging of runs of sibling paths into compound paths
+    if flags.join:
+        N = mergepaths(rn)
+        notes.append("{} paths merged away".format(N))
+    # 4e: rounding of coordinates within the given device-space error
+    if flags.precision != None:
+        size = treesize(rn)
+        dev = roundgeometry(rn, flags.precision)
+        notes.append("rounded within {:.3g} (at most {} allowed), {:+} bytes".format(dev, flags.precision, treesize(rn) - size))
+    # 5: extraction of repeated styles into classes
+    if flags.classes:
+        size = treesize(rn)
+        N, M = classify(rn, set(rn.iter()) - mdelem, flags.editable)
+        notes.append("{} classes for {} nodes, {:+} bytes".format(N, M, treesize(rn) - size))
     # Final output
     outfn = "{0}-rarified.svg".format(f[:-4])
-    with open(outfn, 'w') as outf:
-        if flags.xml: outf.write('<?xml version="1.0" encoding="UTF-8" standalone="no"?>\n')
-        tr.write(outf, "unicode")
+    with open(outfn, 'wb') as outf:
+        if flags.xml: outf.write(b'<?xml version="1.0" encoding="UTF-8" standalone="no"?>\n')
+        splice(outf, t.tostring(rn, "unicode"), payloads)
     end = time.perf_counter()
     before, after = os.path.getsize(f), os.path.getsize(outfn)
     print("{}: {:.3f}, {} → {} ({:.2%})".format(f, end - begin, before, after, after / before))
+    for n in notes: print("  " + n)
 
 for n in svgnms: t.register_namespace(n, svgnms[n])
 cdl = argparse.ArgumentParser(prog="./rarify.py", description="Rarify, the uncouth SVG optimiser")
@@ -94,9 +151,22 @@ cdl.add_argument("-m", "--metadata", action="store_false", default=True, help="d
 cdl.add_argument("-d", "--dimens", action="store_true", default=False, help="remove dimensions")
 cdl.add_argument("-s", "--scripts", action="store_false", default=True, help="don't remove scripts")
 cdl.add_argument("-l", "--lpecrush", action="store_true", default=False, help="remove LPE output (this will break the picture outside Inkscape if it has LPEs)")
+cdl.add_argument("-b", "--bake", action="store_true", default=False, help="bake transforms into geometry where the stroke allows it")
+cdl.add_argument("-f", "--simplify", type=float, metavar="TOL", help="refit paths into fewer cubics lying within TOL user units of the original")
+cdl.add_argument("-c", "--colours", type=float, metavar="DE", help="merge colours within a CIELAB distance (ΔE) of DE of a more used colour")
+cdl.add_argument("-k", "--classes", action="store_true", default=False, help="move styles shared by many nodes into CSS classes")
+cdl.add_argument("-e", "--editable", action="store_true", default=False, help="with -k, leave the styles of Inkscape shapes, LPE paths and text alone")
+cdl.add_argument("-r", "--rename", action="store_true", default=False, help="rename IDs to the shortest names available, the most referenced first")
+cdl.add_argument("-p", "--precision", type=float, metavar="EPS", help="round coordinates so that nothing moves more than EPS device pixels")
+cdl.add_argument("-j", "--join", action="store_true", default=False, help="merge runs of sibling paths with the same style that do not overlap")
+cdl.add_argument("-u", "--cull", action="store_true", default=False, help="remove objects lying entirely outside the viewport")
+cdl.add_argument("-o", "--occluded", action="store_true", default=False, help="with or without -u, also remove objects hidden under opaque rectangles painted later")
+cdl.add_argument("-a", "--unclip", action="store_true", default=False, help="remove clip paths whose shapes contain everything they clip")
+cdl.add_argument("-z", "--zlib", action="store_true", default=False, help="recompress embedded PNGs at the highest zlib level")
 cdl.add_argument("-x", "--xml", action="store_true", default=False, help="add XML header")
 cdl.add_argument("files", nargs="*", help="list of files to rarify (if left blank, defaults to all SVG files in current directory)")
 flags = cdl.parse_args()
+if flags.precision != None and not 0 < flags.precision < float("inf"): cdl.error("argument -p/--precision: EPS must be a positive number")
 flist = flags.files
 if not flist: flist = glob("*.svg")
 flist = [s for s in flist if not s.endswith("-rarified.svg")]
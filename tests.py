@@ -18,3 +18,582 @@ for b in (b0, b1, b2, bl):
     end = time.perf_counter()
     print(l) # 7.504871040167711, 6.4788922059020155, 6.879770127854842, 6.982407360576692
     print((end - start) * 10, "ms / length") # 1.6, 2, 2.3, 4 ms
+
+# Path writing and transform baking: 2000 random paths of lines, quadratics, cubics and arcs written out and read back,
+# then a document of groups nested three deep (each with a <title>) around shapes, baked and compared shape by shape in world space
+import xml.etree.ElementTree as t
+from kinback.discord import rng
+from kinback.svggeom import bake, nodetf, ident, _svg
+rng.setbackend("mt", 2016)
+pt = lambda: complex(rng.uniform(-100, 100), rng.uniform(-100, 100))
+def randpath():
+    d = ["M{} {}".format(rng.uniform(-100, 100), rng.uniform(-100, 100))]
+    for q in range(rng.randrange(1, 9)):
+        k = rng.randrange(4)
+        if k == 0: d.append("L{} {}".format(*(x for z in [pt()] for x in (z.real, z.imag))))
+        elif k == 1: d.append("Q" + " ".join("{} {}".format(z.real, z.imag) for z in (pt(), pt())))
+        elif k == 2: d.append("C" + " ".join("{} {}".format(z.real, z.imag) for z in (pt(), pt(), pt())))
+        else: d.append("A{} {} {} {} {} {} {}".format(rng.uniform(150, 300), rng.uniform(150, 300), rng.uniform(0, 180), rng.randrange(2), rng.randrange(2), *(x for z in [pt()] for x in (z.real, z.imag))))
+    return " ".join(d) + ("z" if rng.randrange(2) else "")
+worst, size, start = 0, [0, 0], time.perf_counter()
+for q in range(2000):
+    d = randpath()
+    p = path(d)
+    out = p.tosvg()
+    r = path(out)
+    worst = max(worst, max(abs(a(u / 8) - b(u / 8)) for sa, sb in zip(p.segments, r.segments) for a, b in zip(sa, sb) for u in range(9)))
+    size[0], size[1] = size[0] + len(d), size[1] + len(out)
+end = time.perf_counter()
+print("round trip: largest deviation", worst, ",", size[0], "→", size[1], "bytes,", round(2000 / (end - start)), "paths/s")
+def randshape():
+    k, a, b = rng.randrange(3), pt(), complex(rng.uniform(1, 20), rng.uniform(1, 20))
+    if k == 0: return '<path d="{}"/>'.format(randpath())
+    if k == 1: return '<rect x="{}" y="{}" width="{}" height="{}"/>'.format(a.real, a.imag, b.real, b.imag)
+    return '<ellipse cx="{}" cy="{}" rx="{}" ry="{}"/>'.format(a.real, a.imag, b.real, b.imag)
+def randtf():
+    return rng.choice(("translate({} {})".format(rng.uniform(-50, 50), rng.uniform(-50, 50)), "scale({})".format(rng.uniform(0.5, 2)), "rotate({})".format(rng.uniform(0, 360)), "scale({} {})".format(rng.uniform(0.5, 2), rng.uniform(0.5, 2))))
+def group(depth):
+    if not depth: return randshape()
+    return '<g transform="{}"><title>layer</title>{}</g>'.format(randtf(), "".join(group(depth - 1) for q in range(3)))
+rn = t.fromstring('<svg xmlns="http://www.w3.org/2000/svg">' + "".join(group(3) for q in range(30)) + '</svg>')
+def marks(rn):
+    """World-space points pinning down each shape: path nodes, handles and arc centres, rectangle corners, ellipse centres and radii."""
+    res = []
+    def walk(node, m):
+        for k in node:
+            if k.tag == _svg + "title": continue
+            km = m @ nodetf(k)
+            if k.tag == _svg + "g": walk(k, km)
+            elif k.tag == _svg + "path": res.append([z for sp in (km @ path(k.get("d"))).segments for s in sp for z in (s.p if type(s) == bezier else (s(0), s(1), s.c))])
+            elif k.tag == _svg + "rect":
+                x, y, w, h = (float(k.get(a, "0")) for a in ("x", "y", "width", "height"))
+                res.append([km @ complex(x + a * w, y + b * h) for a in (0, 1) for b in (0, 1)])
+            else:
+                e = km @ ellipt.fromsvg_node(k)[0]
+                res.append([e.c, complex(*sorted((e.r1, e.r2)))])
+    walk(rn, ident)
+    return res
+def apart(a, b): return max(min(abs(z - w) for w in b) for z in a)
+before = marks(rn)
+start = time.perf_counter()
+N = bake(rn)
+end = time.perf_counter()
+after = marks(rn)
+print(N, "transforms baked,", sum(1 for k in rn.iter() if k.get("transform") != None), "left, largest deviation", max(max(apart(a, b), apart(b, a)) for a, b in zip(before, after)), "in", round(end - start, 3), "s")
+nested = t.fromstring('<svg xmlns="http://www.w3.org/2000/svg"><g transform="translate(10 10)"><rect width="1" height="1"/><svg width="5" height="5"><rect width="5" height="5"/></svg></g></svg>')
+print(bake(nested), "transforms baked with a nested <svg>, which keeps none:", nested[0].get("transform"), nested[0][1].get("transform"))
+# Round trips deviate by at most a few 1e-4 (from arcs, whose centres amplify the rounding of radii to eight figures) and halve the data at about 900 paths/s.
+# 274 of 390 transforms baked in about 0.3 s, every shape staying within 1e-4 of where it was; before <title>s were skipped, none could be pushed down.
+# A group over a nested <svg> keeps its transform (0 baked; translate(10 10) None), since an SVG 1.1 <svg> cannot take it.
+
+# Path simplification: throughput and node reduction on a traced (polyline) wave
+from kinback.fitting import simplify, nodecount
+from math import sin, cos
+from bisect import bisect_left, bisect_right
+def distance(p, q, tol, n = 64):
+    """The largest distance from points of either x-monotone path (n per segment) to the polyline through the other's, searching within tol in x."""
+    def one(A, B):
+        xs, worst = [z.real for z in B], 0
+        for z in A:
+            lo, hi = max(bisect_left(xs, z.real - tol) - 1, 0), min(bisect_right(xs, z.real + tol), len(B) - 1)
+            worst = max(worst, min(abs(z - a - min(max(dot(z - a, b - a) / abs(b - a) ** 2, 0), 1) * (b - a)) if b != a else abs(z - a) for a, b in zip(B[lo:hi], B[lo + 1:hi + 1])))
+        return worst
+    P, Q = ([s(k / n) for sp in r.segments for s in sp for k in range(n + 1)] for r in (p, q))
+    return max(one(P, Q), one(Q, P))
+trace = path("M" + " ".join("{:.3f} {:.3f}".format(i * 0.5, 20 * sin(i * 0.05) + 5 * cos(i * 0.013)) for i in range(2000)))
+for tol in (0.05, 0.2, 1):
+    start = time.perf_counter()
+    fit = simplify(trace, tol)
+    end = time.perf_counter()
+    print(tol, nodecount(trace), "→", nodecount(fit), "nodes,", round(1999 / (end - start)), "segments/s, distance", distance(trace, fit, tol))
+# 2000 → 136, 100, 33 nodes at about 5000 segments/s; measured densely, the fits lie about 0.0496, 0.195 and 0.63 from the trace, each within its tolerance.
+
+# Flevobézier fits per second on recorded node strings (mane strokes)
+from kinback.flevo import refit
+strokes = ("M98.12 112.01 97.97 125.29 99.20 134.48 102.93 140.52 107.22 151.00 108.90 161.32 113.15 170.07 120.08 177.00 127.49 185.10 136.73 188.75 148.13 191.11 157.63 194.22 166.15 200.68",
+           "M91.65 105.51 83.94 114.03 76.87 121.30 70.50 130.12 65.69 135.64 58.61 144.23 52.01 151.53 43.34 157.12 30.75 160.75 24.49 163.79 10.73 165.82 2.08 169.31 -5.66 173.73",
+           "M107.26 105.76 119.36 109.96 128.39 111.59 137.82 111.03 151.66 112.07 159.50 112.12 170.45 110.68 177.91 110.64 187.86 107.91 194.36 103.13 205.58 102.36 218.49 101.06")
+for s in strokes: print(refit(s))
+start = time.perf_counter()
+for q in range(10):
+    for s in strokes: refit(s)
+end = time.perf_counter()
+print(round(30 / (end - start)), "fits/s") # about 20 fits/s; the sampling projection of the old extension managed about 5
+
+# Root finding after deflation: quintics to septics built from known real roots, and projections onto 500 random cubics against dense sampling
+rng.setbackend("mt", 2016)
+missed = 0
+for q in range(2000):
+    roots = [rng.uniform(-3, 3) for k in range(rng.randrange(5, 8))]
+    p = Pol([1])
+    for r in roots: p = p * Pol([-r, 1])
+    found = polroots(p)[0]
+    missed += any(min(abs(r - f) for f in found) > 1e-6 for r in roots)
+worse = 0
+for q in range(500):
+    b = bezier(*(complex(rng.uniform(0, 10), rng.uniform(0, 10)) for k in range(4)))
+    z = complex(rng.uniform(0, 10), rng.uniform(0, 10))
+    worse += abs(b(b.projection(z)) - z) > min(abs(b(k / 1000) - z) for k in range(1001)) + 1e-9
+print(missed, "polynomials with missed roots,", worse, "projections beaten by sampling")
+# None of either; with the derivatives of the undeflated polynomial in Laguerre's method (the old polroots), every polynomial missed roots and 86 projections were wrong.
+
+# Incremental least-squares windows against stress theory on a long traced stroke (the latter is roughly cubic in the window length)
+from kinback.flevo import flevobezier, flevofit
+longstroke = [complex(i * 3, 40 * sin(i * 0.02) + 5 * cos(i * 0.013)) for i in range(100)]
+for engine in (flevobezier, flevofit):
+    start = time.perf_counter()
+    res = engine(longstroke, False)
+    end = time.perf_counter()
+    print(engine.__name__, (len(res) - 1) // 3, "cubics,", end - start, "s") # 1 cubic in 4.2 s and 0.006 s
+start = time.perf_counter()
+for q in range(100):
+    for s in strokes: refit(s, flevofit)
+end = time.perf_counter()
+print(round(300 / (end - start)), "incremental fits/s") # about 1500 fits/s
+# Repeated nodes, common in traced input, are dropped before fitting instead of dividing by zero
+from re import sub
+doubled = [sub(r"(-?[\d.]+ -?[\d.]+)", r"\1 \1", s) for s in strokes]
+print(all(refit(a, e) == refit(s, e) for e in (flevobezier, flevofit) for a, s in zip(doubled, strokes)), refit("M0 0 0 0 5 5"), refit("M3 3 3 3", flevofit))
+# True m0 0c1.6666667 1.6666667 3.3333333 3.3333333 5 5 m3 3h0
+
+# Flevobézier in batch: 3000 jittered mane strokes in one file, fitted incrementally over pools of 1 and 4 processes and checked against refit()
+import sys, os, io, re, contextlib
+from concurrent.futures import ProcessPoolExecutor
+sys.path.insert(0, "programs")
+import flevobatch
+from kinback.svgproc import svgnms
+for n in svgnms: t.register_namespace(n, svgnms[n])
+rng.setbackend("mt", 2016)
+ds = []
+for q in range(3000):
+    nodes = [complex(*map(float, s.split())) for s in re.findall(r"-?[\d.]+ -?[\d.]+", strokes[q % 3][1:])]
+    ds.append("M" + " ".join("{:.2f} {:.2f}".format(z.real + rng.uniform(-0.5, 0.5), z.imag + rng.uniform(-0.5, 0.5)) for z in nodes))
+with open("flevobatch-test.svg", "w") as f: f.write('<svg xmlns="http://www.w3.org/2000/svg">' + "".join('<path d="{}"/>'.format(d) for d in ds) + '</svg>')
+for jobs in (1, 4):
+    with ProcessPoolExecutor(jobs) as pool, contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        counts = flevobatch.flevobatch("flevobatch-test.svg", pool, incremental=True, jobs=jobs)
+        end = time.perf_counter()
+    fitted = [p.get("d") for p in t.parse("flevobatch-test-fitted.svg").getroot()]
+    print(jobs, "processes:", counts, "paths and subpaths,", round(counts[1] / (end - start)), "fits/s,", sum(a != refit(d, flevofit) for a, d in zip(fitted, ds)), "differing from refit()")
+os.remove("flevobatch-test.svg")
+os.remove("flevobatch-test-fitted.svg")
+# About 1000 fits/s with either pool on a single CPU (the fitting is all there is to parallelise), every path matching refit().
+
+# Variates per second from each KinrossRandom backend
+from kinback.discord import KinrossRandom, backends
+for b in backends:
+    r = KinrossRandom(b, 2016)
+    for name, f in (("random", r.random), ("gauss", lambda: r.gauss(0, 1)), ("gamma", lambda: r.gammavariate(2.5, 1)), ("binomial", lambda: r.binomialvariate(100, 0.3)),
+                    ("poisson", lambda: r.poissonvariate(30)), ("geometric", lambda: r.geometricvariate(0.3)), ("kumaraswamy", lambda: r.kumaraswamyvariate(2, 3))):
+        start = time.perf_counter()
+        for q in range(20000): f()
+        end = time.perf_counter()
+        print(b, name, round(20000 / (end - start)), "/s")
+# Uniforms: system 1.2M/s, mt 7.7M/s, pcg 1.1M/s (NumPy pays its call overhead per scalar; it comes into its own in batches).
+# The custom variates run about twice as fast on mt as on the system source.
+
+# Batch variates: two-sample Kolmogorov–Smirnov tests against the scalar methods, then batch rates at a million samples
+import numpy as np
+def ks2(a, b):
+    a, b = np.sort(a), np.sort(b)
+    x = np.concatenate((a, b))
+    d = np.max(np.abs(np.searchsorted(a, x, "right") / a.size - np.searchsorted(b, x, "right") / b.size))
+    return d, 1.628 * sqrt((a.size + b.size) / (a.size * b.size)) # critical value at the 1% level
+r = KinrossRandom("mt", 2016)
+for name, args in (("gammavariate", (2.5, 1)), ("gammavariate", (0.4, 1)), ("binomialvariate", (100, 0.3)), ("binomialvariate", (1000, 0.9)),
+                   ("poissonvariate", (5,)), ("poissonvariate", (30,)), ("poissonvariate", (1000,))):
+    f = getattr(r, name)
+    scalar = np.array([f(*args) for q in range(20000)])
+    d, crit = ks2(scalar, f(*args, size=20000))
+    start = time.perf_counter()
+    f(*args, size=10 ** 6)
+    end = time.perf_counter()
+    print(name, args, "KS {:.4f} (critical {:.4f}),".format(d, crit), round(10 ** 6 / (end - start)), "/s")
+# KS statistics all well under the critical 0.0163. Batches run at 0.8–5M/s against the scalar 50–200k/s;
+# the counts (statistics on integers make KS conservative) are slowest, their rejection loops being the longest.
+
+# Bridson discs on arrays against nested lists
+from kinback.discord import rng, bridsondisc, bridsonlists
+rng.setbackend("mt", 2016)
+for f in (bridsonlists, bridsondisc):
+    start = time.perf_counter()
+    pts = list(f(400+300j, 1))
+    end = time.perf_counter()
+    a = np.array(pts)
+    near = min(np.abs(a[i + 1:] - a[i]).min() for i in range(0, len(a) - 1, 97)) # spot check of the minimum distance
+    print(f.__name__, len(pts), "points,", round(len(pts) / (end - start)), "points/s, nearest", near) # about 8k and 40k points/s
+start = time.perf_counter()
+pts = list(bridsondisc(4000+4000j, 1, max_points=10 ** 6))
+end = time.perf_counter()
+print(len(pts), "points of a 4000 × 4000 field in", end - start, "s") # about 25 s
+
+# Tiled Poisson discs: the same points for any number of workers, and throughput with one and with all
+from kinback.discord import tileddisc
+import os
+runs = {}
+for jobs in sorted({1, os.cpu_count() or 1}):
+    start = time.perf_counter()
+    runs[jobs] = list(tileddisc(2000+1000j, 1, tile=250, jobs=jobs, seed=2016))
+    end = time.perf_counter()
+    print(jobs, "workers:", len(runs[jobs]), "points,", round(len(runs[jobs]) / (end - start)), "points/s")
+print("same points for any worker count:", len(set(map(tuple, runs.values()))) == 1) # about 40k points/s per worker
+
+# Uniform and Poisson-disc points inside a mane-like outline: 400 cubics around a wavy flower with three round holes (arcs)
+from kinback.regions import pathregion
+from kinback.segment import bezier
+from cmath import exp
+def wavy(t): return (120 + 40 * sin(7 * t) + 15 * sin(19 * t)) * exp(1j * t)
+def wavyd(t): return (wavy(t + 1e-6) - wavy(t - 1e-6)) / 2e-6
+h = 2 * pi / 400
+mane = path("M-10 0A10 10 0 0 0 10 0A10 10 0 0 0 -10 0ZM50 -40A6 6 0 0 0 62 -40A6 6 0 0 0 50 -40ZM-70 30A14 14 0 0 0 -42 30A14 14 0 0 0 -70 30Z")
+mane.segments.append([bezier(wavy(i * h), wavy(i * h) + wavyd(i * h) * h / 3, wavy((i + 1) * h) - wavyd((i + 1) * h) * h / 3, wavy((i + 1) * h)) for i in range(400)])
+mane.closed.append(True)
+rng.setbackend("mt", 2016)
+start = time.perf_counter()
+reg = pathregion(mane)
+end = time.perf_counter()
+print("rasterised in", end - start, "s; outline crosses", np.count_nonzero(reg.status == 2), "of", reg.cand.size, "cells") # 0.03 s
+start = time.perf_counter()
+z = reg.points(10 ** 6)
+end = time.perf_counter()
+print(round(10 ** 6 / (end - start)), "uniform points/s") # about 7M/s
+start = time.perf_counter()
+pts = list(reg.bridsondisc(1))
+end = time.perf_counter()
+print(len(pts), "disc points,", round(len(pts) / (end - start)), "points/s") # about 30k points/s
+
+# Winding numbers of the mane outline around a million random points of its bounding box
+from kinback.regions import winding
+start = time.perf_counter()
+eng = winding(mane)
+end = time.perf_counter()
+print(eng.cx.shape[0], "monotone pieces in", end - start, "s") # 457 pieces in 0.01 s
+x, y = rng.npgen().uniform(-180, 180, (2, 10 ** 6))
+for eo in (False, True):
+    start = time.perf_counter()
+    inside = eng.contains(x, y, eo)
+    end = time.perf_counter()
+    print("evenodd" if eo else "nonzero", np.count_nonzero(inside), "inside,", round(10 ** 6 / (end - start)), "queries/s") # about 3M queries/s
+
+# Streaming spallation: copies per second, and peak memory (which should not grow with the number of copies) against building the tree
+import sys, os, tracemalloc
+sys.path.insert(0, "programs")
+import spallator
+rng.setbackend("mt", 2016)
+with open(os.devnull, "w") as sink:
+    for obj, rtf, name in ((spallator.circle, spallator.rtf_circle, "circles"), (spallator.star, spallator.rtf_star, "stars")):
+        for symbol in (False, True):
+            start = time.perf_counter()
+            n = spallator.spallatestream(sink, obj, rtf, 2, 10000+10000j, symbol)
+            end = time.perf_counter()
+            print(name, "as <use>" if symbol else "", n, "copies,", round(n / (end - start)), "copies/s")
+    for side in (3000, 10000):
+        tracemalloc.start()
+        n = spallator.spallatestream(sink, spallator.circle, spallator.rtf_circle, 2, complex(side, side))
+        print("stream of", n, "circles, peak", tracemalloc.get_traced_memory()[1] >> 10, "KiB")
+        tracemalloc.stop()
+tracemalloc.start()
+spallator.spallate(spallator.circle, spallator.rtf_circle, 2, 10000+10000j)
+print("tree of 20000 circles, peak", tracemalloc.get_traced_memory()[1] >> 10, "KiB")
+tracemalloc.stop()
+# Circles and stars manage about 16k copies/s (the former are dominated by Rytz's construction), and as <use> elements about 150k/s.
+# The stream peaks at about 250 KiB for any number of copies, where the tree of 20000 circles takes over 9 MiB.
+
+# Vectorised spallation of 10^6 copies (density 1 on a 10000 square) against the streaming rates above
+with open(os.devnull, "w") as sink:
+    for obj, vtf, name in ((spallator.circle, spallator.vtf_circle, "circles"), (spallator.star, spallator.vtf_star, "stars"), (spallator.astroid, spallator.vtf_astroid, "astroids")):
+        start = time.perf_counter()
+        n = spallator.spallatevector(sink, obj, vtf, 100, 10000+10000j)
+        end = time.perf_counter()
+        print(name, n, "copies,", round(n / (end - start)), "copies/s")
+# Circles come out at about 400k copies/s, stars at 200k/s and transformed astroids at 350k/s: 25 and 12 times the streams.
+
+# Pony palettes: 10^5 in batch against the per-colour loop
+import ponygen
+start = time.perf_counter()
+for q in range(1000): ponygen.coatgen(0), ponygen.manegen(0), ponygen.eyesgen(0)
+end = time.perf_counter()
+print("loop:", round(1000 / (end - start)), "palettes/s")
+g = np.random.default_rng(2016)
+start = time.perf_counter()
+pal = ponygen.palettes(10 ** 5, 0, g)
+end = time.perf_counter()
+print("batch:", round(10 ** 5 / (end - start)), "palettes/s,", len(set(pal[0])), "distinct coats")
+l, c, h = g.beta(5.5, 1.3, 10 ** 5) * 100, g.gamma(2.5, 1 / 8.2, 10 ** 5) * 100, g.vonmises(1.8, 7.7, 10 ** 5)
+print("mare coats in gamut:", ponygen.lch2rgbs(l, c, h)[1].mean())
+# The loop makes about 12k palettes/s and the batch about 220k/s.
+
+# Colour conversions: the array versions against the scalar ones, then 10^6 colours at once
+from kinback import colours
+c = rng.npgen().random((10 ** 6, 4))
+for name in ("rgb2xyz", "xyz2rgb", "rgb2lab", "lab2rgb"):
+    vf, sf = getattr(colours, name + "s"), getattr(colours, name)
+    start = time.perf_counter()
+    res = vf(c)
+    mid = time.perf_counter()
+    ref = [sf(tuple(x)) for x in c[:10 ** 4].tolist()]
+    end = time.perf_counter()
+    print(name, "max error", np.abs(res[:10 ** 4] - ref).max(), round(10 ** 6 / (mid - start)), "colours/s against", round(10 ** 4 / (end - mid)))
+for name, args in (("alphacomp", (c, c[::-1])), ("alphaback", (c, c[::-1])), ("alphatint", (c, c[::-1], c[::2].repeat(2, 0), c[1::2].repeat(2, 0)))):
+    vf, sf = getattr(colours, name + "s"), getattr(colours, name)
+    start = time.perf_counter()
+    res = vf(*args)
+    mid = time.perf_counter()
+    ref = [sf(*x) for x in zip(*(a[:10 ** 4].tolist() for a in args))]
+    end = time.perf_counter()
+    print(name, "max error", np.abs(res[:10 ** 4] - ref).max(), round(10 ** 6 / (mid - start)), "colours/s against", round(10 ** 4 / (end - mid)))
+# The array versions convert 6–14M colours/s and composite 2.5–8M/s, 15 to 40 times the scalar rates, agreeing to rounding error.
+
+# Colour merging: 30000 colours scattered around 300 centres, clustered at ΔE 3
+rng.setbackend("mt", 2016)
+centres = [tuple(rng.random() for i in range(3)) for q in range(300)]
+cols = [tuple(min(max(x + rng.normalvariate(0, 0.004), 0), 1) for x in rng.choice(centres)) + (1,) for q in range(30000)]
+weights = [rng.randrange(1, 20) for c in cols]
+start = time.perf_counter()
+lead = colours.colourclusters(cols, 3, weights)
+end = time.perf_counter()
+labs = [colours.rgb2lab(c) for c in cols]
+worst = max(sum((p - q) ** 2 for p, q in zip(labs[i][:3], labs[j][:3])) for i, j in enumerate(lead)) ** 0.5
+print(len(set(lead)), "clusters, largest ΔE to leader", worst, round(30000 / (end - start)), "colours/s")
+# About 80k colours/s, no colour moving more than ΔE 3; the 300 centres yield a few more clusters where their spreads straddle the threshold.
+
+# Least-squares tints: 3000 problems of 200 pairs each, with 2/255 noise and 10% of the composites replaced by garbage
+g = np.random.default_rng(2016)
+tint = g.random((3000, 1, 4))
+tint[..., 3] = 0.2 + 0.6 * g.random((3000, 1))
+back = g.random((3000, 200, 4))
+back[..., 3] = 1
+comp = colours.alphacomps(back, tint)
+comp[..., :3] += g.normal(0, 2 / 255, (3000, 200, 3))
+junk = g.random((3000, 200)) < 0.1
+comp[junk, :3] = g.random((junk.sum(), 3))
+comp = colours.clip01s(comp)
+start = time.perf_counter()
+est = colours.alphatintlsq(back, comp)
+end = time.perf_counter()
+print("least squares: mean error", np.abs(est - tint[:, 0]).mean(), round(3000 / (end - start)), "problems/s")
+print("without rejection:", np.abs(colours.alphatintlsq(back, comp, rounds=0) - tint[:, 0]).mean())
+print("alphatint on the first two pairs:", np.abs(colours.alphatints(back[:, 0], comp[:, 0], back[:, 1], comp[:, 1]) - tint[:, 0]).mean())
+# Mean errors of about 0.0012, 0.05 and 0.11 respectively; about 6000 problems (1.2M pairs) per second.
+
+# Style classes: 2000 paths over 20 styles (most of them sharing a few), and the time to parse each version and resolve every node's style
+import xml.etree.ElementTree as t
+from kinback.svgproc import classify, obtainstyle, _svg
+from kinback.regexes import stylecrunch
+rng.setbackend("mt", 2016)
+styles = ["fill:#{:06x};stroke:#000;stroke-width:{};stroke-linejoin:round".format(rng.randrange(1 << 24), rng.randrange(1, 4)) for i in range(20)]
+doc = '<svg xmlns="http://www.w3.org/2000/svg">' + "".join('<path style="{}" d="M{} {}h5v5z"/>'.format(styles[min(int(rng.expovariate(0.3)), 19)], rng.randrange(100), rng.randrange(100)) for i in range(2000)) + '</svg>'
+rn = t.fromstring(doc)
+print(classify(rn, set(rn.iter())), "classes and nodes")
+classed = t.tostring(rn, "unicode")
+def resolve(src):
+    rn = t.fromstring(src)
+    sheet = rn.find(_svg + "style")
+    rules = {}
+    if sheet != None:
+        for r in sheet.text.split("}")[:-1]:
+            sel, body = r.split("{")
+            rules[sel[1:]] = stylecrunch(body)
+    return [dict(rules.get(n.get("class"), {}), **obtainstyle(n)) for n in rn.iter() if n is not sheet]
+for name, src in (("inline", doc), ("classes", classed)):
+    start = time.perf_counter()
+    for q in range(20): res = resolve(src)
+    end = time.perf_counter()
+    print(name, len(src.encode()), "bytes,", round((end - start) / 20 * 1000, 2), "ms to parse and resolve")
+print(resolve(doc) == resolve(classed))
+# The classes take the document from about 186 kB to 77 kB and halve the time to parse it and resolve the styles (about 15 ms against 7).
+
+# Deduplication of defs: n copies each of a gradient, a gradient referencing it and a clip path, in two styles; the time should grow linearly
+from kinback.svgproc import dedupdefs
+for n in (1000, 10000, 20000):
+    defs = "".join('<linearGradient id="l{0}"><stop offset="0" style="stop-color:#f00"/><stop offset="1" stop-color="#{1}"/></linearGradient>'
+                   '<radialGradient id="r{0}" xlink:href="#l{0}" r="3"/><clipPath id="c{0}"><path d="M0 0h{1}v9z"/></clipPath>'.format(i, 100 + i % 2) for i in range(n))
+    body = "".join('<rect style="fill:url(#r{0})" clip-path="url(#c{0})"/>'.format(i) for i in range(n))
+    rn = t.fromstring('<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink"><defs>' + defs + '</defs>' + body + '</svg>')
+    start = time.perf_counter()
+    N = dedupdefs(rn)
+    end = time.perf_counter()
+    print(3 * n, "defs,", N, "merged in", round(end - start, 3), "s,", len(rn[0]), "left")
+# 2994, 29994 and 59994 merged, 6 left, in about 0.1, 1.1 and 2.5 s.
+
+# Renaming IDs: 500 gradients (the first 26 already named a to z, the rest as Inkscape names them), referenced 1 to 20 times each
+# as fills of rectangles that also stroke with a random gradient; every reference must still reach the same gradient afterwards
+from kinback.svgproc import renameids
+rng.setbackend("mt", 2016)
+gid = [chr(97 + i) if i < 26 else "linearGradient{}".format(8472 + i) for i in range(500)]
+defs = "".join('<linearGradient id="{}"><stop offset="0" stop-color="#{:03x}"/></linearGradient>'.format(g, i) for i, g in enumerate(gid))
+body = "".join('<rect fill="url(#{})" stroke="url(#{})"/>'.format(g, rng.choice(gid)) for g in gid for q in range(rng.randrange(1, 21)))
+rn = t.fromstring('<svg xmlns="http://www.w3.org/2000/svg"><defs>' + defs + '</defs>' + body + '</svg>')
+def reached(rn):
+    colour = {g.get("id"): g[0].get("stop-color") for g in rn[0]}
+    return [(colour[r.get("fill")[5:-1]], colour[r.get("stroke")[5:-1]]) for r in rn[1:]]
+before, size = reached(rn), len(t.tostring(rn))
+start = time.perf_counter()
+N = renameids(rn)
+end = time.perf_counter()
+print(N, "IDs renamed in", round(end - start, 3), "s,", size, "→", len(t.tostring(rn)), "bytes,", len({g.get("id") for g in rn[0]}), "distinct IDs,", sum(a != b for a, b in zip(before, reached(rn))), "references moved")
+# 500 IDs renamed (into 500 distinct ones) in about 0.05 s, taking the document from 462 kB to 290 kB, with no reference moved.
+# Renaming one ID at a time, into names still held by others, moved 4 references.
+
+# Precision control: the logos and a synthetic document of Inkscape-precision curves under transforms of scales 0.2, 2 and 20
+from kinback.svggeom import roundgeometry
+rng.setbackend("mt", 2016)
+def pt(): return "{:.6f},{:.6f}".format(rng.uniform(0, 100), rng.uniform(0, 100))
+parts = []
+for g in range(30):
+    s = rng.choice((0.1, 1, 10))
+    parts.append('<g transform="matrix({:.6f},{:.6f},{:.6f},{:.6f},{:.5f},{:.5f})">'.format(0.8 * s, 0.6 * s, -0.6 * s, 0.8 * s, rng.uniform(0, 500), rng.uniform(0, 500)))
+    parts += ['<path d="M{}C{}z"/>'.format(pt(), " ".join(pt() for i in range(9))) for i in range(10)]
+    parts.append('<circle cx="{:.6f}" cy="{:.6f}" r="{:.6f}"/></g>'.format(*(rng.uniform(0, 50) for i in range(3))))
+synth = '<svg xmlns="http://www.w3.org/2000/svg" width="1000" height="1000" viewBox="0 0 500 500">' + "".join(parts) + '</svg>'
+corpus = [open("iconography/" + f).read() for f in ("kinross-logo.svg", "rarify-logo.svg")] + [synth]
+for eps in (0.5, 0.05, 0.005):
+    before = after = dev = 0
+    start = time.perf_counter()
+    for src in corpus:
+        rn = t.fromstring(src)
+        before += len(t.tostring(rn))
+        dev = max(dev, roundgeometry(rn, eps))
+        after += len(t.tostring(rn))
+    end = time.perf_counter()
+    print("eps", eps, "max deviation", round(dev, 5), before, "→", after, "bytes in", round(end - start, 3), "s")
+# Deviations stay at 30% of the allowance or less while the corpus shrinks by 28–48% (of which the rewriting of the path data alone gives some).
+
+# Nested transforms: groups five deep of translations, rotations about centres and scalings, with Inkscape-precision paths at every level;
+# the true device movement of every node and handle, accumulated through the rounded transforms, against eps and the reported bound
+def nest(depth):
+    form = rng.randrange(3)
+    if form == 0: tfs = "translate({:.6f} {:.6f})".format(rng.uniform(-20, 20), rng.uniform(-20, 20))
+    elif form == 1: tfs = "rotate({:.5f} {:.6f} {:.6f})".format(rng.uniform(0, 360), rng.uniform(0, 100), rng.uniform(0, 100))
+    else: tfs = "scale({:.5f})".format(rng.uniform(0.5, 1.5))
+    inner = "".join(nest(depth - 1) for q in range(2)) if depth else ""
+    return '<g transform="{}"><path d="M{}C{}"/>{}</g>'.format(tfs, pt(), " ".join(pt() for i in range(3)), inner)
+nested = '<svg xmlns="http://www.w3.org/2000/svg">' + "".join(nest(4) for q in range(4)) + '</svg>'
+def handles(rn):
+    res = []
+    def walk(node, m):
+        for k in node:
+            km = m @ nodetf(k)
+            if k.tag == _svg + "g": walk(k, km)
+            else: res.extend(km @ z for sp in path(k.get("d")).segments for s in sp for z in s.p)
+    walk(rn, ident)
+    return res
+for eps in (0.5, 0.05, 0.005):
+    rn = t.fromstring(nested)
+    before = handles(rn)
+    dev = roundgeometry(rn, eps)
+    print("nested, eps", eps, "reported", round(dev, 5), "true", round(max(abs(a - b) for a, b in zip(before, handles(rn))), 5))
+# The true movements (about 20% of eps) stay under the reported bounds, which stay under eps. When every level had the whole of eps,
+# nodes moved by up to 1.08 eps while less was reported.
+
+# Merging sibling paths: a layer of 2000 random small triangles in 4 styles, runs of the same style averaging 10 paths
+from kinback.svggeom import mergepaths
+rng.setbackend("mt", 2016)
+fills, body, style = ("#c33", "#3c3", "#33c", "#999"), [], 0
+for i in range(2000):
+    if rng.random() < 0.1: style = rng.randrange(4)
+    x, y = rng.uniform(0, 1000), rng.uniform(0, 1000)
+    body.append('<path d="M{:.2f} {:.2f}l{:.2f} {:.2f} {:.2f} {:.2f}z" fill="{}"/>'.format(x, y, rng.uniform(1, 20), rng.uniform(1, 20), rng.uniform(-20, 0), rng.uniform(1, 20), fills[style]))
+rn = t.fromstring('<svg xmlns="http://www.w3.org/2000/svg"><g>' + "".join(body) + '</g></svg>')
+start = time.perf_counter()
+N = mergepaths(rn)
+end = time.perf_counter()
+print(2000, "→", 2000 - N, "paths in", round(end - start, 3), "s")
+# 2000 → 169 paths in about 0.3 s, overlapping neighbours in a run starting new compound paths.
+
+# Culling: n random squares on and around a 1000 × 1000 canvas, every tenth an opaque occluder ten times larger; the time should grow near-linearly
+from kinback.svggeom import cull
+for n in (2000, 20000):
+    rng.setbackend("mt", 2016)
+    body = []
+    for i in range(n):
+        x, y = rng.uniform(-500, 1500), rng.uniform(-500, 1500)
+        s = 100 if i % 10 == 9 else rng.uniform(2, 10)
+        body.append('<rect x="{:.1f}" y="{:.1f}" width="{:.1f}" height="{:.1f}" fill="#{:03x}"/>'.format(x, y, s, s, rng.randrange(4096)))
+    rn = t.fromstring('<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 1000 1000">' + "".join(body) + '</svg>')
+    start = time.perf_counter()
+    off, hid = cull(rn, True)
+    end = time.perf_counter()
+    print(n, "shapes:", off, "off the canvas,", hid, "hidden, in", round(end - start, 3), "s")
+# About 0.08 and 0.85 s, agreeing with a brute-force check of every pair.
+# A translucent or blended group hides nothing even if its child claims full opacity, and letterboxing under preserveAspectRatio shows more than the viewBox
+svg = '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 100 100" width="200" height="100"{}>{}</svg>'
+cases = [("", '<rect x="10" y="10" width="20" height="20" fill="red"/><g opacity="0.5"><rect width="50" height="50" style="opacity:1"/></g>', (0, 0)),
+         ("", '<rect x="10" y="10" width="20" height="20" fill="red"/><g><rect width="50" height="50"/></g>', (0, 1)),
+         ("", '<rect x="120" y="10" width="20" height="20"/><rect x="160" y="10" width="20" height="20"/>', (1, 0)),
+         (' preserveAspectRatio="xMinYMin"', '<rect x="-40" y="10" width="20" height="20"/><rect x="160" y="10" width="20" height="20"/>', (1, 0)),
+         (' preserveAspectRatio="none"', '<rect x="120" y="10" width="20" height="20"/>', (1, 0)),
+         ("", '<rect x="10" y="10" width="20" height="20" fill="red"/><rect width="50" height="50" fill="#00f" style="mix-blend-mode:multiply"/>', (0, 0)),
+         ("", '<rect x="10" y="10" width="20" height="20" fill="red"/><g style="mix-blend-mode:screen"><rect width="50" height="50"/></g>', (0, 0))]
+print("cull cases:", [cull(t.fromstring(svg.format(a, b)), True) == want for a, b, want in cases])
+# All True.
+
+# Clip elimination: 1000 squares clipped by rotated squares, circles and triangles of random sizes; a clip is removed only if a dense sample
+# of the stroked square's box lies inside the clip shape
+from kinback.svggeom import unclip
+from cmath import rect
+rng.setbackend("mt", 2016)
+defs, body, truth = [], [], 0
+for i in range(1000):
+    x, y, s, k = rng.uniform(0, 80), rng.uniform(0, 80), rng.uniform(2, 20), i % 3
+    c, R, th = complex(x + s / 2, y + s / 2) + rect(rng.uniform(0, 5), rng.uniform(0, 6.3)), rng.uniform(5, 30), rng.uniform(0, 90)
+    if k == 0: defs.append('<clipPath id="c{}" transform="rotate({} {} {})"><rect x="{}" y="{}" width="{}" height="{}"/></clipPath>'.format(i, th, c.real, c.imag, c.real - R, c.imag - R, 2 * R, 2 * R))
+    elif k == 1: defs.append('<clipPath id="c{}"><circle cx="{}" cy="{}" r="{}"/></clipPath>'.format(i, c.real, c.imag, R))
+    else: defs.append('<clipPath id="c{}"><path d="M{} {}h{}l{} {}z"/></clipPath>'.format(i, c.real - R, c.imag - R, 4 * R, -4 * R, 4 * R))
+    body.append('<rect x="{}" y="{}" width="{}" height="{}" stroke="#000" clip-path="url(#c{})"/>'.format(x, y, s, s, i))
+    pts = [complex(x - 2 + (s + 4) * a / 8, y - 2 + (s + 4) * b / 8) for a in range(9) for b in range(9)] # the stroke reaches 2 (miters)
+    if k == 0: ok = all(abs(((z - c) * rect(1, -th * pi / 180)).real) <= R and abs(((z - c) * rect(1, -th * pi / 180)).imag) <= R for z in pts)
+    elif k == 1: ok = all(abs(z - c) <= R for z in pts)
+    else: ok = all(z.real >= c.real - R and z.imag >= c.imag - R and z.real + z.imag <= c.real + c.imag + 2 * R for z in pts)
+    truth += ok
+rn = t.fromstring('<svg xmlns="http://www.w3.org/2000/svg"><defs>' + "".join(defs) + '</defs>' + "".join(body) + '</svg>')
+start = time.perf_counter()
+N = unclip(rn)
+end = time.perf_counter()
+print(N, "clips removed,", truth, "expected,", len(rn[0]), "clip paths left, in", round(end - start, 3), "s")
+# All 731 clips whose shapes contain their content are removed (and their clip paths with them), in about 0.12 s.
+# Hidden clip shapes clip nothing, so they never make a clip removable
+svg = '<svg xmlns="http://www.w3.org/2000/svg"><clipPath id="c"{}><rect width="100" height="100"{}/></clipPath><rect x="10" y="10" width="10" height="10" clip-path="url(#c)"/></svg>'
+cases = [("", "", 1), ("", ' display="none"', 0), ("", ' style="visibility:hidden"', 0), (' visibility="collapse"', "", 0), (' visibility="hidden"', ' visibility="visible"', 1)]
+print("unclip cases:", [unclip(t.fromstring(svg.format(a, b))) == want for a, b, want in cases])
+# All True.
+
+# Embedded rasters: a 14 MB document of 100 distinct 512 × 512 PNGs (fast-deflated banded gradients with specks) read, whacked and written whole
+# against with the images stowed in a memory map, then the PNGs recompressed; peak memory is that of the Python heap
+import mmap, zlib, struct, base64
+from kinback.svgproc import whack, refsof
+from kinback.rasters import stow, splice, recompress
+def chunk(k, d): return struct.pack(">I", len(d)) + k + d + struct.pack(">I", zlib.crc32(k + d))
+gen, imgs = np.random.RandomState(2016), []
+for i in range(100):
+    px = (np.add.outer(np.arange(512), np.arange(512 * 3)) * (i % 8 + 1) // 64 * (i + 5) + (gen.rand(512, 512 * 3) < 0.02) * 99).astype(np.uint8)
+    data = np.hstack((np.zeros((512, 1), np.uint8), px)).tobytes()
+    png = b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", 512, 512, 8, 2, 0, 0, 0)) + chunk(b"IDAT", zlib.compress(data, 1)) + chunk(b"IEND", b"")
+    imgs.append('<image x="{}" width="8" height="8" xlink:href="data:image/png;base64,{}"/>'.format(i * 8, base64.b64encode(png).decode()))
+fn = "rasters-test.svg"
+with open(fn, "w") as f: f.write('<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink">' + "".join(imgs) + '</svg>')
+del imgs
+for stowed in (False, True):
+    tracemalloc.start()
+    start = time.perf_counter()
+    if stowed:
+        with open(fn, "rb") as f: src = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        doc, payloads = stow(src)
+        rn = t.fromstring(doc)
+    else: rn = t.parse(fn).getroot()
+    for n in rn.iter(): whack(n), refsof(n)
+    with open(os.devnull, "wb") as sink:
+        if stowed: splice(sink, t.tostring(rn, "unicode"), payloads)
+        else: sink.write(t.tostring(rn, "unicode").encode())
+    end = time.perf_counter()
+    print("stowed" if stowed else "whole", os.path.getsize(fn), "bytes in", round(end - start, 3), "s, peak", tracemalloc.get_traced_memory()[1] >> 10, "KiB")
+    tracemalloc.stop()
+start = time.perf_counter()
+N, saved = recompress(payloads)
+end = time.perf_counter()
+print(N, "PNGs recompressed,", saved, "bytes saved in", round(end - start, 2), "s")
+del doc, payloads
+src.close()
+os.remove(fn)
+# Whole, about 0.24 s and 40 MiB at peak; stowed, 0.1 s and 112 KiB. Level 9 halves the PNGs (7.5 of 14 MB saved) at about 0.12 s per image.